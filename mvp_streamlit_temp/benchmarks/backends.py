@@ -0,0 +1,56 @@
+"""
+Latency, memory and score parity of the embedding backends on CPU.
+
+    python benchmarks/backends.py [--backends torch torch-int8 onnx] [--documents 64] [--threads 4]
+
+Exits non-zero when a backend's similarity scores drift from full precision PyTorch by more than --tolerance.
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+def MakeDocuments(count):
+    skills = ["Python", "SQL", "Kubernetes", "PyTorch", "Docker", "Spark", "React", "Go", "AWS", "Communication", "Leadership"]
+    return [
+        f"Skills: {', '.join(skills[(index + offset) % len(skills)] for offset in range(5))}\n"
+        f"Experience: {index % 12} years, Engineer\n\nEducation: {'Masters' if index % 2 else 'Bachelors'}\n"
+        f"Strengths:\n- Delivered project {index} end to end\n- Mentored {index % 5} engineers"
+        for index in range(count)
+    ]
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare embedding backends.")
+    parser.add_argument("--backends", nargs="+", default=["torch", "torch-int8", "onnx"])
+    parser.add_argument("--documents", type=int, default=64)
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--threads", type=int, default=0, help="Intra-op threads (0 = library default)")
+    parser.add_argument("--tolerance", type=float, default=0.02)
+    args = parser.parse_args(argv)
+
+    if args.threads:
+        os.environ["EMBEDDING_THREADS"] = str(args.threads)
+    from scripts import embeddings
+
+    documents = MakeDocuments(args.documents)
+    failed = False
+    print(f"{'backend':<12} {'load s':>8} {'load MB':>9} {'p50 ms/doc':>11} {'max score diff':>15}")
+    for backend in args.backends:
+        embeddings.WarmUpModel(backend=backend)
+        stats = embeddings.GetModelStats()[f"{embeddings.DEFAULT_EMBEDDING_MODEL} [{backend}]"]
+        timings = []
+        for _ in range(args.repeats):
+            start = time.perf_counter()
+            embeddings.EmbedTexts(documents, backend=backend)
+            timings.append((time.perf_counter() - start) / len(documents))
+        parity = embeddings.CheckBackendParity(backend, documents, tolerance=args.tolerance)
+        failed |= not parity["within_tolerance"]
+        print(f"{backend:<12} {stats['load_time']:>8.2f} {stats['memory_consumed']:>9.1f} "
+              f"{statistics.median(timings) * 1000:>11.2f} {parity['max_score_difference']:>15.4f}")
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
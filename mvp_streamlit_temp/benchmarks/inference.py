@@ -0,0 +1,41 @@
+"""
+Aggregate similarity throughput of concurrent sessions: every session embedding on its own thread against
+the shared micro-batching embedding server.
+
+    python benchmarks/inference.py [--sessions 1 4 16] [--requests 20]
+"""
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from scripts.embeddings import EmbedTexts, WarmUpModel
+from scripts.inference import EmbeddingServer
+
+def Session(embed, session, requests):
+    # One recruiter scoring resumes one at a time, as CalculateResumeSimilarity does
+    for request in range(requests):
+        embed([f"Resume {session}-{request}: Python, SQL and 5 years of data engineering", "Data engineer with Python and SQL"])
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Per-session against micro-batched embedding.")
+    parser.add_argument("--sessions", type=int, nargs="+", default=[1, 4, 16])
+    parser.add_argument("--requests", type=int, default=20, help="Similarity requests per session")
+    args = parser.parse_args(argv)
+
+    WarmUpModel()
+    server = EmbeddingServer()
+    for sessions in args.sessions:
+        for name, embed in (("direct", EmbedTexts), ("server", server.embed)):
+            start = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=sessions) as executor:
+                list(executor.map(lambda session: Session(embed, session, args.requests), range(sessions)))
+            elapsed = time.perf_counter() - start
+            print(f"{sessions:>3} sessions {name:<6} {sessions * args.requests / elapsed:8.1f} requests/s")
+    stats = server.stats()["batch_size_histogram"]
+    print(f"server: {stats['count']} batches, {stats['sum'] / max(stats['count'], 1):.1f} texts/batch on average")
+
+if __name__ == "__main__":
+    main()
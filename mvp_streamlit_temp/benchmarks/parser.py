@@ -0,0 +1,84 @@
+"""
+Micro-benchmark of response parsing: the single-pass ParseAnalysis against the previous regex chain
+(TextToCommaSeperated + PersonalInformationExtractor + ExcellencyExtractor, reproduced below).
+
+    python benchmarks/parser.py [--repeats 20]
+"""
+import argparse
+import os
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from scripts.parser import ParseAnalysis, ParseSkills
+
+""" Previous implementation, kept here as the reference point """
+def LegacyParse(response_text, resume_text, job_description_text):
+    def text_to_comma_seperated(text):
+        text = text.lower()
+        text = re.sub(r"\*", "", text)
+        text = re.sub(r"(skills|experience|education):", "", text)
+        text = re.sub(r"[.,:]", ",", text)
+        text = re.sub(r"\s+", " ", text).strip()
+        return re.sub(r",\s*", ",", text)
+
+    email = re.search(r'[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}', resume_text)
+    phone = re.search(r'\+?\d[\d -]{8,12}\d', resume_text)
+    match = re.search(r"Experience:\s*(.*?)\n\nEducation:\s*(.*?)(?=\n|$)", response_text, re.DOTALL)
+    strengths = re.search(r"Strengths:\s*(?:- )?([\s\S]*?)(?=\nWeaknesses:|\n$)", response_text, re.DOTALL)
+    weaknesses = re.search(r"Weaknesses:\s*(?:- )?([\s\S]*?)$", response_text, re.DOTALL)
+    return (
+        text_to_comma_seperated(response_text).split(','),
+        text_to_comma_seperated(job_description_text).split(','),
+        email, phone, match, strengths, weaknesses,
+    )
+
+def CurrentParse(response_text, resume_text, job_description_text):
+    return ParseAnalysis(response_text, resume_text), ParseSkills(job_description_text)
+
+""" Synthetic inputs """
+def MakeResponse(skills, strengths):
+    return (
+        "Skills: " + ", ".join(f"Skill {index}" for index in range(skills)) + "\n"
+        "Experience: 7 years, Senior Data Engineer\n\n"
+        "Education: Masters\n"
+        "Strengths:\n" + "\n".join(f"- Strength number {index}, concise and impactful" for index in range(strengths)) + "\n"
+        "Weaknesses:\n- Limited frontend exposure\n"
+    )
+
+def MakeResume(lines):
+    body = "\n".join(f"Worked on project {index} using Python, SQL and Kubernetes for 12 months." for index in range(lines))
+    return f"Jane Doe\nContact: +1 555 010 2000 | jane.doe@example.com\n{body}"
+
+def MakeDriftedResponse(mentions):
+    # Format drift: many "Experience:" mentions and no blank line before Education, the worst case for the lazy DOTALL pattern
+    return "Skills: Python\n" + "Experience: 1 year as intern\n" * mentions + "Education: Bachelors\nStrengths: - Curious"
+
+CASES = {
+    "typical": (MakeResponse(25, 3), MakeResume(40)),
+    "large": (MakeResponse(2000, 500), MakeResume(5000)),
+    "drifted": (MakeDriftedResponse(5000), MakeResume(40)),
+}
+
+def TimePerDocument(function, arguments, repeats):
+    start = time.perf_counter()
+    for _ in range(repeats):
+        function(*arguments)
+    return (time.perf_counter() - start) / repeats
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Per-document cost of parsing the LLM response and resume.")
+    parser.add_argument("-n", "--repeats", type=int, default=20)
+    args = parser.parse_args(argv)
+
+    job_description = MakeResponse(40, 3)
+    print(f"{'case':<10} {'chars':>10} {'legacy ms':>12} {'single-pass ms':>16} {'speed-up':>10}")
+    for case, (response, resume) in CASES.items():
+        arguments = (response, resume, job_description)
+        legacy = TimePerDocument(LegacyParse, arguments, args.repeats)
+        current = TimePerDocument(CurrentParse, arguments, args.repeats)
+        print(f"{case:<10} {len(response) + len(resume):>10} {legacy * 1000:>12.3f} {current * 1000:>16.3f} {legacy / current:>9.1f}x")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,45 @@
+"""
+Per-candidate cost of skill matching against a job description: exact set intersection against
+MatchSkills with the embedding index warm (every phrase already embedded).
+
+    python benchmarks/skills.py [--candidates 200] [--vocabulary 2000]
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from scripts.skills import MatchSkills, SkillIndex
+
+def ExactMatch(resume_skill_set, job_description_skill_set):
+    return list(set(resume_skill_set) & set(job_description_skill_set)), list(set(job_description_skill_set) - set(resume_skill_set))
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Exact against embedding-based skill matching.")
+    parser.add_argument("--candidates", type=int, default=200)
+    parser.add_argument("--vocabulary", type=int, default=2000, help="Distinct skill phrases across all candidates")
+    parser.add_argument("--skills", type=int, default=30, help="Skills per resume and job description")
+    args = parser.parse_args(argv)
+
+    generator = random.Random(7)
+    vocabulary = [f"skill {index} framework" if index % 3 else f"skill {index}" for index in range(args.vocabulary)]
+    job_description_skill_set = generator.sample(vocabulary, args.skills)
+    candidates = [generator.sample(vocabulary, args.skills) for _ in range(args.candidates)]
+
+    with tempfile.TemporaryDirectory() as directory:
+        index = SkillIndex(directory=directory)
+        start = time.perf_counter()
+        index.embeddings(vocabulary)
+        print(f"index build: {len(vocabulary)} phrases in {time.perf_counter() - start:.2f} s")
+
+        for name, function in (("exact", ExactMatch), ("fuzzy", lambda resume, job: MatchSkills(resume, job, index=index))):
+            start = time.perf_counter()
+            for resume_skill_set in candidates:
+                function(resume_skill_set, job_description_skill_set)
+            print(f"{name:<6} {(time.perf_counter() - start) / len(candidates) * 1000:.3f} ms/candidate")
+
+if __name__ == "__main__":
+    main()
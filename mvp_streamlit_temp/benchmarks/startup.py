@@ -0,0 +1,106 @@
+"""
+Cold-start benchmark for streamlit_app.py.
+
+Every measurement runs in a fresh interpreter and records:
+- import_time / import_rss: wall time and resident memory after importing the app's modules
+- heavy_modules: heavy dependencies that the imports pulled in (should be empty)
+- first_render_time / first_render_rss: one full script run of the landing page through streamlit's AppTest
+
+    python benchmarks/startup.py                       # print results
+    python benchmarks/startup.py --save-baseline       # store results as the baseline
+    python benchmarks/startup.py --check               # fail when slower/larger than the baseline allows
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BASELINE_PATH = os.path.join(APP_DIR, "benchmarks", "baselines", "startup.json")
+HEAVY_MODULES = ("torch", "transformers", "google.generativeai", "pandas", "PyPDF2", "numpy", "docxtpl")
+
+IMPORT_PROBE = """
+import json, psutil, sys, time
+start = time.perf_counter()
+import scripts.analysis, scripts.decision, scripts.helpers, scripts.streamlit_helpers
+elapsed = time.perf_counter() - start
+print(json.dumps({
+    "import_time": elapsed,
+    "import_rss": psutil.Process().memory_info().rss / (1024 ** 2),
+    "heavy_modules": sorted(name for name in %r if name in sys.modules),
+}))
+""" % (HEAVY_MODULES,)
+
+RENDER_PROBE = """
+import json, psutil, time
+from streamlit.testing.v1 import AppTest
+start = time.perf_counter()
+app = AppTest.from_file("streamlit_app.py", default_timeout=120)
+app.run()
+print(json.dumps({
+    "first_render_time": time.perf_counter() - start,
+    "first_render_rss": psutil.Process().memory_info().rss / (1024 ** 2),
+    "render_exceptions": [str(exception.value) for exception in app.exception],
+}))
+"""
+
+def RunProbe(code):
+    # Background model warm-up would make the RSS readings depend on thread timing
+    environment = {**os.environ, "WARM_UP_MODELS": "0"}
+    completed = subprocess.run([sys.executable, "-c", code], cwd=APP_DIR, env=environment, capture_output=True, text=True, check=True)
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+def Measure(repeats):
+    samples = [{**RunProbe(IMPORT_PROBE), **RunProbe(RENDER_PROBE)} for _ in range(repeats)]
+    results = {
+        metric: statistics.median(sample[metric] for sample in samples)
+        for metric in ("import_time", "import_rss", "first_render_time", "first_render_rss")
+    }
+    results["heavy_modules"] = sorted({name for sample in samples for name in sample["heavy_modules"]})
+    results["render_exceptions"] = samples[-1]["render_exceptions"]
+    return results
+
+def CompareToBaseline(results, baseline, tolerance):
+    """Returns a list of human readable regressions against the baseline."""
+    regressions = []
+    for metric in ("import_time", "import_rss", "first_render_time", "first_render_rss"):
+        if metric in baseline and results[metric] > baseline[metric] * (1 + tolerance):
+            regressions.append(f"{metric}: {results[metric]:.3f} > baseline {baseline[metric]:.3f} (+{tolerance:.0%})")
+    if results["heavy_modules"]:
+        regressions.append(f"heavy modules imported at start-up: {', '.join(results['heavy_modules'])}")
+    if results["render_exceptions"]:
+        regressions.append(f"first render raised: {results['render_exceptions']}")
+    return regressions
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Measure cold-start import time, RSS and time-to-first-render of the app.")
+    parser.add_argument("-n", "--repeats", type=int, default=3, help="Fresh interpreter runs per measurement (median is reported)")
+    parser.add_argument("--baseline", default=BASELINE_PATH, help="Baseline JSON file")
+    parser.add_argument("--save-baseline", action="store_true", help="Write the results to the baseline file")
+    parser.add_argument("--check", action="store_true", help="Exit non-zero when results regress against the baseline")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="Allowed relative slowdown/growth before --check fails")
+    args = parser.parse_args(argv)
+
+    results = Measure(args.repeats)
+    print(json.dumps(results, indent=2))
+
+    if args.save_baseline:
+        os.makedirs(os.path.dirname(args.baseline), exist_ok=True)
+        with open(args.baseline, "w") as f:
+            json.dump(results, f, indent=2)
+
+    if args.check:
+        if not os.path.exists(args.baseline):
+            print(f"No baseline at {args.baseline}; run with --save-baseline first.", file=sys.stderr)
+            return 2
+        with open(args.baseline, "r") as f:
+            regressions = CompareToBaseline(results, json.load(f), args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION {regression}", file=sys.stderr)
+        return 1 if regressions else 0
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,252 @@
+"""
+Benchmark suite for every stage of the analysis pipeline, runnable offline.
+
+Gemini is replaced by the deterministic "Fake" technology (scripts/fake_llm.py) with a configurable
+latency, and resumes/job descriptions are generated synthetically as text and as PDF files.
+
+    python benchmarks/suite.py                                   # all corpus sizes, print results
+    python benchmarks/suite.py --sizes small --llm-latency 0.5   # one size, slower fake LLM
+    python benchmarks/suite.py --save-baseline                   # store results as the baseline
+    python benchmarks/suite.py --check                           # fail on regressions against the baseline
+
+No baseline is committed: timings depend on the machine and embedding model, so produce one with
+--save-baseline on the machine that runs --check. --check exits 2 when the baseline is missing or was
+measured under other settings, and counts stages the baseline lacks as regressions.
+
+Reports p50/p95 latency and throughput for ReadFromPDF, GenAITextExtractor, ExcellencyExtractor and
+CalculateResumeSimilarity per document, and for the whole batch through the pipeline behind AnalyseBatch.
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import time
+from io import BytesIO
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BASELINE_PATH = os.path.join(APP_DIR, "benchmarks", "baselines", "suite.json")
+CORPUS_SIZES = {"small": 10, "medium": 50, "large": 200}
+
+sys.path.insert(0, APP_DIR)
+
+""" Synthetic corpus """
+FIRST_NAMES = ("Ava", "Liam", "Maya", "Noah", "Priya", "Omar", "Lena", "Kenji", "Sofia", "Ethan")
+LAST_NAMES = ("Patel", "Garcia", "Nguyen", "Smith", "Okafor", "Kim", "Rossi", "Silva", "Cohen", "Ito")
+SKILLS = ("Python", "SQL", "Java", "React", "Docker", "Kubernetes", "AWS", "PyTorch", "Spark", "Tableau", "Excel", "Leadership", "Communication")
+DEGREES = ("Bachelors", "Masters", "Doctorate")
+
+def MakeResume(generator, paragraphs):
+    name = f"{generator.choice(FIRST_NAMES)} {generator.choice(LAST_NAMES)}"
+    lines = [
+        name,
+        f"{name.lower().replace(' ', '.')}@example.com | +1 555 {generator.randint(100, 999)} {generator.randint(1000, 9999)}",
+        f"{generator.randint(1, 15)} years of experience. {generator.choice(DEGREES)} degree.",
+        "Skills: " + ", ".join(generator.sample(SKILLS, 6)),
+    ]
+    for index in range(paragraphs):
+        lines.append(f"Project {index}: built a {generator.choice(SKILLS)} service with {generator.choice(SKILLS)} for {generator.randint(2, 30)} months.")
+    return "\n".join(lines)
+
+def MakeJobDescription(generator):
+    return (
+        "We are hiring a Senior Data Engineer.\n"
+        f"Requirements: {', '.join(generator.sample(SKILLS, 6))}.\n"
+        "5 years of experience and a Masters degree preferred."
+    )
+
+def _pdf_escape(line):
+    return line.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+def MakePDF(text, lines_per_page=50):
+    """Minimal multi-page PDF with one Helvetica text stream per page."""
+    lines = text.splitlines() or [""]
+    pages = [lines[start:start + lines_per_page] for start in range(0, len(lines), lines_per_page)]
+    objects = ["<< /Type /Catalog /Pages 2 0 R >>", None, "<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"]
+    page_ids = []
+    for page_lines in pages:
+        stream = "BT /F1 10 Tf 14 TL 40 800 Td " + " ".join(f"({_pdf_escape(line)}) Tj T*" for line in page_lines) + " ET"
+        objects.append(f"<< /Length {len(stream.encode('latin-1', 'replace'))} >>\nstream\n{stream}\nendstream")
+        objects.append(f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 842] /Resources << /Font << /F1 3 0 R >> >> /Contents {len(objects)} 0 R >>")
+        page_ids.append(len(objects))
+    objects[1] = f"<< /Type /Pages /Kids [{' '.join(f'{page_id} 0 R' for page_id in page_ids)}] /Count {len(page_ids)} >>"
+
+    output = BytesIO()
+    output.write(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(output.tell())
+        output.write(f"{number} 0 obj\n{body}\nendobj\n".encode("latin-1", "replace"))
+    xref_offset = output.tell()
+    output.write(f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode())
+    for offset in offsets:
+        output.write(f"{offset:010d} 00000 n \n".encode())
+    output.write(f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref_offset}\n%%EOF\n".encode())
+    return output.getvalue()
+
+def MakeCorpus(size, seed=7):
+    """Returns (job description text, [(filename, bytes)]) with every other resume as a PDF of varying length."""
+    generator = random.Random(seed)
+    resumes = []
+    for index in range(size):
+        text = MakeResume(generator, paragraphs=generator.choice((10, 40, 150)))
+        if index % 2:
+            resumes.append((f"resume_{index}.txt", text.encode("utf-8")))
+        else:
+            resumes.append((f"resume_{index}.pdf", MakePDF(text)))
+    return MakeJobDescription(generator), resumes
+
+""" Measurement """
+def Percentile(samples, percentile):
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, max(0, round(percentile / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+def Summarise(samples, documents=None):
+    documents = documents or len(samples)
+    return {
+        "p50": Percentile(samples, 50),
+        "p95": Percentile(samples, 95),
+        "throughput": documents / sum(samples) if sum(samples) else float("inf"),
+    }
+
+def TimeEach(function, arguments):
+    samples, outputs = [], []
+    for argument in arguments:
+        start = time.perf_counter()
+        outputs.append(function(*argument))
+        samples.append(time.perf_counter() - start)
+    return samples, outputs
+
+def RunSize(size, repeats):
+    from scripts.helpers import ReadFromPDF, GenAITextExtractor, ExcellencyExtractor, CalculateResumeSimilarity
+    from scripts.pipeline import ExtractText, RunPipeline
+    from scripts.embeddings import WarmUpModel
+
+    # Model loading is a one-off per process and would dominate the first similarity sample
+    WarmUpModel()
+
+    job_description_text, resumes = MakeCorpus(size)
+    texts = [ExtractText(filename, data)[0] for filename, data in resumes]
+    pdfs = [(BytesIO(data),) for filename, data in resumes if filename.endswith(".pdf")]
+    analysed_job_description = GenAITextExtractor(job_description_text, "Fake")
+
+    read_samples, _ = TimeEach(ReadFromPDF, pdfs)
+    llm_samples, responses = TimeEach(GenAITextExtractor, [(text, "Fake") for text in texts])
+    parse_samples, _ = TimeEach(ExcellencyExtractor, [(response,) for response in responses])
+    similarity_samples, _ = TimeEach(CalculateResumeSimilarity, [(response, analysed_job_description) for response in responses])
+
+    batch_samples = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        RunPipeline(resumes, job_description_text, "Fake")
+        batch_samples.append(time.perf_counter() - start)
+
+    return {
+        "documents": size,
+        "ReadFromPDF": Summarise(read_samples),
+        "GenAITextExtractor": Summarise(llm_samples),
+        "ExcellencyExtractor": Summarise(parse_samples),
+        "CalculateResumeSimilarity": Summarise(similarity_samples),
+        "AnalyseBatch": {
+            "p50": Percentile(batch_samples, 50),
+            "p95": Percentile(batch_samples, 95),
+            "throughput": size / Percentile(batch_samples, 50),
+        },
+    }
+
+def Environment(args):
+    """Settings a baseline is only comparable under."""
+    from scripts.embeddings import DEFAULT_EMBEDDING_MODEL, EMBEDDING_BACKEND
+    return {
+        "embedding_model": DEFAULT_EMBEDDING_MODEL,
+        "embedding_backend": EMBEDDING_BACKEND,
+        "llm_latency": args.llm_latency,
+        "llm_jitter": args.llm_jitter,
+        "cpus": os.cpu_count(),
+    }
+
+def LoadBaseline(path, environment):
+    """Returns the baseline results, raising ValueError when the file is missing or was measured elsewhere."""
+    if not os.path.exists(path):
+        raise ValueError(f"No baseline at {path}. Produce one on this machine with --save-baseline before using --check.")
+    with open(path, "r") as f:
+        baseline = json.load(f)
+    if "results" not in baseline:
+        raise ValueError(f"{path} predates recorded environments. Regenerate it with --save-baseline.")
+    mismatched = {key: (baseline.get("environment", {}).get(key), value) for key, value in environment.items() if baseline.get("environment", {}).get(key) != value}
+    if mismatched:
+        details = ", ".join(f"{key} {saved!r} != {current!r}" for key, (saved, current) in mismatched.items())
+        raise ValueError(f"Baseline at {path} was measured under different settings ({details}). Regenerate it with --save-baseline.")
+    return baseline["results"]
+
+def CompareToBaseline(results, baseline, tolerance):
+    """Returns a list of human readable p50 regressions against the baseline, counting stages it lacks."""
+    regressions = []
+    for size, stages in results.items():
+        for stage, metrics in stages.items():
+            if not isinstance(metrics, dict):
+                continue
+            reference = baseline.get(size, {}).get(stage)
+            if reference is None:
+                regressions.append(f"{size}/{stage}: missing from the baseline")
+            elif metrics["p50"] > reference["p50"] * (1 + tolerance):
+                regressions.append(f"{size}/{stage}: p50 {metrics['p50'] * 1000:.2f} ms > baseline {reference['p50'] * 1000:.2f} ms (+{tolerance:.0%})")
+    return regressions
+
+def PrintResults(results):
+    print(f"{'corpus':<8} {'stage':<26} {'p50 ms':>10} {'p95 ms':>10} {'docs/s':>10}")
+    for size, stages in results.items():
+        for stage, metrics in stages.items():
+            if isinstance(metrics, dict):
+                print(f"{size:<8} {stage:<26} {metrics['p50'] * 1000:>10.2f} {metrics['p95'] * 1000:>10.2f} {metrics['throughput']:>10.1f}")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Per-stage and whole-batch benchmarks with a local Gemini stand-in.")
+    parser.add_argument("--sizes", nargs="+", choices=list(CORPUS_SIZES), default=list(CORPUS_SIZES))
+    parser.add_argument("--repeats", type=int, default=3, help="Whole-batch runs per corpus size")
+    parser.add_argument("--llm-latency", type=float, default=0.2, help="Fake Gemini latency in seconds")
+    parser.add_argument("--llm-jitter", type=float, default=0.1, help="Fake Gemini extra latency, uniform in [0, jitter]")
+    parser.add_argument("--json", help="Also write the results to this file")
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument("--check", action="store_true", help="Exit non-zero when a p50 regresses against the baseline")
+    parser.add_argument("--tolerance", type=float, default=0.25)
+    args = parser.parse_args(argv)
+
+    # Read by scripts.fake_llm at import time
+    os.environ["FAKE_LLM_LATENCY"] = str(args.llm_latency)
+    os.environ["FAKE_LLM_JITTER"] = str(args.llm_jitter)
+    os.chdir(APP_DIR)
+
+    environment = Environment(args)
+    # Fail before the run rather than after it
+    if args.check and not args.save_baseline:
+        try:
+            baseline = LoadBaseline(args.baseline, environment)
+        except ValueError as e:
+            print(f"ERROR {e}", file=sys.stderr)
+            return 2
+
+    results = {size: RunSize(CORPUS_SIZES[size], args.repeats) for size in args.sizes}
+    PrintResults(results)
+
+    if args.json:
+        os.makedirs(os.path.dirname(os.path.abspath(args.json)), exist_ok=True)
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+    if args.save_baseline:
+        os.makedirs(os.path.dirname(os.path.abspath(args.baseline)), exist_ok=True)
+        with open(args.baseline, "w") as f:
+            json.dump({"environment": environment, "results": results}, f, indent=2)
+        baseline = results
+
+    if args.check:
+        regressions = CompareToBaseline(results, baseline, args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION {regression}", file=sys.stderr)
+        return 1 if regressions else 0
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
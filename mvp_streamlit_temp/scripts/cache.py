@@ -0,0 +1,115 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+# Cache location and limits, overridable through environment variables
+CACHE_PATH = os.getenv("GENAI_CACHE_PATH", "./.cache/genai_responses.sqlite3")
+CACHE_MAX_ENTRIES = int(os.getenv("GENAI_CACHE_MAX_ENTRIES", "5000"))
+CACHE_MAX_BYTES = int(os.getenv("GENAI_CACHE_MAX_BYTES", str(64 * 1024 ** 2)))
+CACHE_MAX_AGE = float(os.getenv("GENAI_CACHE_MAX_AGE", str(30 * 24 * 3600)))
+CACHE_DISABLED = os.getenv("GENAI_CACHE_DISABLED", "").lower() in ("1", "true", "yes")
+
+def NormaliseText(text):
+    """Collapses whitespace so re-uploads with different line endings or spacing hit the same entry."""
+    return " ".join(text.split())
+
+def CacheKey(text, prompt_template, model_name, generation_config):
+    """Content address of an LLM request. Any change to the prompt, model or config gives a new key."""
+    payload = json.dumps(
+        {
+            "text": NormaliseText(text),
+            "prompt": hashlib.sha256(prompt_template.encode("utf-8")).hexdigest(),
+            "model": model_name,
+            "config": generation_config,
+        },
+        sort_keys=True,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+class ResponseCache:
+    """SQLite backed LLM response cache with size and age based LRU eviction."""
+
+    def __init__(self, path=CACHE_PATH, max_entries=CACHE_MAX_ENTRIES, max_bytes=CACHE_MAX_BYTES, max_age=CACHE_MAX_AGE):
+        self.path = path
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._connection = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute(
+            """CREATE TABLE IF NOT EXISTS responses (
+                key TEXT PRIMARY KEY,
+                response TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                created REAL NOT NULL,
+                accessed REAL NOT NULL
+            )"""
+        )
+        self._connection.execute("CREATE INDEX IF NOT EXISTS responses_accessed ON responses (accessed)")
+        self._connection.commit()
+
+    def get(self, key):
+        now = time.time()
+        with self._lock:
+            row = self._connection.execute("SELECT response, created FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is None or now - row[1] > self.max_age:
+                self.misses += 1
+                return None
+            self._connection.execute("UPDATE responses SET accessed = ? WHERE key = ?", (now, key))
+            self._connection.commit()
+            self.hits += 1
+            return row[0]
+
+    def set(self, key, response):
+        now = time.time()
+        with self._lock:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO responses (key, response, size, created, accessed) VALUES (?, ?, ?, ?, ?)",
+                (key, response, len(response.encode("utf-8")), now, now),
+            )
+            self._evict(now)
+            self._connection.commit()
+
+    def _evict(self, now):
+        # Expired entries first, then least recently used until both limits hold
+        self._connection.execute("DELETE FROM responses WHERE created < ?", (now - self.max_age,))
+        count, size = self._connection.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses").fetchone()
+        if count <= self.max_entries and size <= self.max_bytes:
+            return
+        for key, entry_size in self._connection.execute("SELECT key, size FROM responses ORDER BY accessed").fetchall():
+            if count <= self.max_entries and size <= self.max_bytes:
+                break
+            self._connection.execute("DELETE FROM responses WHERE key = ?", (key,))
+            count -= 1
+            size -= entry_size
+
+    def clear(self):
+        with self._lock:
+            self._connection.execute("DELETE FROM responses")
+            self._connection.commit()
+
+    def stats(self):
+        with self._lock:
+            count, size = self._connection.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses").fetchone()
+        return {"hits": self.hits, "misses": self.misses, "entries": count, "bytes": size}
+
+_response_cache = None
+_response_cache_lock = threading.Lock()
+
+def GetResponseCache():
+    """Returns the process-wide response cache, or None when caching is disabled."""
+    global _response_cache
+    if CACHE_DISABLED:
+        return None
+    with _response_cache_lock:
+        if _response_cache is None:
+            _response_cache = ResponseCache()
+        return _response_cache
@@ -1,126 +1,279 @@
+import base64
+import functools
 import os
+import queue
 import re
 import smtplib
 import streamlit as st
-import time
+import threading
+import zipfile
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime
-from docxtpl import DocxTemplate
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 from email.mime.base import MIMEBase
 from email import encoders
 from io import BytesIO
+from .lazy import LazyModule
+from .pools import SubmitToProcessPool
 
-def EmailOfferLetter(offer_letter, volunteer_waiver, applicant_name, applicant_email, job_role):
-    with st.status("Emailing offer letter...", expanded=True) as status:
-        port = 587 #Default port for GMAIL TLS
-        smtp_server = "smtp.gmail.com"
-        st.write("Fetching authentication details...")
-        time.sleep(1)
-        sender_email = st.secrets.google.account_email
-        password = st.secrets.google.account_password
-        if not sender_email or not password:
-            status.update(label=f"Authentication records not found. Set environmental variables/secrets: account_email, account_password", state="error", expanded=False)
-            return False
-        
-        st.write("Processing input fields.")
-        time.sleep(1)
-        applicant_name = re.sub(r'[^a-zA-Z0-9 ]', '', applicant_name)
-        offer_letter_filename = f"{applicant_name} CDF Offer Letter - {job_role}.docx"
-        volunteer_waiver_filename = "CDF Volunteer Waiver.docx"
-
-        if not applicant_email:
-            status.update(label="Applicant email required!", state="error", expanded=False)
-            return False
-        st.write("Generating email body...")
-        time.sleep(1)
-        body = f"""Hello {str(applicant_name)},\n\nWe are delighted to welcome you to the Community Dreams Foundation!\n
+docxtpl = LazyModule("docxtpl")
+
+# Outgoing mail server; SMTP_STARTTLS=0 and SMTP_USER without SMTP_PASSWORD allow a local stand-in such as aiosmtpd
+SMTP_SERVER = os.getenv("SMTP_SERVER", "smtp.gmail.com")
+SMTP_PORT = int(os.getenv("SMTP_PORT", "587")) #Default port for GMAIL TLS
+SMTP_STARTTLS = os.getenv("SMTP_STARTTLS", "1") != "0"
+# Connections opened in parallel by a bulk send
+EMAIL_WORKERS = int(os.getenv("EMAIL_WORKERS", "4"))
+# Deliberately loose: one "@" and a dotted domain. Rejects the parser's "Email Not Found" placeholder
+EMAIL_PATTERN = re.compile(r"[^@\s]+@[^@\s]+\.[^@\s]+")
+
+VOLUNTEER_WAIVER_FILENAME = "CDF Volunteer Waiver.docx"
+EMAIL_SUBJECT = "Test Mail: Welcome to Community Dreams Foundation! Important Onboarding Documents Attached"
+EMAIL_BODY = """Hello {applicant_name},\n\nWe are delighted to welcome you to the Community Dreams Foundation!\n
 To ensure a smooth onboarding process, please find attached the necessary documents required for your employment.\n
 Kindly review, fill out, sign, and return these documents to us at your earliest convenience. You can simply reply to this email with the completed documents attached. If the start date in the offer letter needs to be changed, please update in the word document and share the signed copies with us. After sharing the documents, you'll receive an invitation to join our Slack channel. Please remain vigilant for any email notifications regarding further instructions.\n
 Should you have any questions or need further clarification on any of the documents, please don't hesitate to contact us.\n
 Regards\nAI Applicant Tracking System"""
 
-        message = MIMEMultipart()
-        message["From"] = sender_email
-        message["To"] = applicant_email
-        message["Subject"] = "Test Mail: Welcome to Community Dreams Foundation! Important Onboarding Documents Attached"
-        message.attach(MIMEText(body, "plain"))
+def IsValidEmail(email):
+    return bool(email) and EMAIL_PATTERN.fullmatch(email.strip()) is not None
+
+def GetSmtpCredentials():
+    """(account email, password) from the SMTP_USER/SMTP_PASSWORD environment variables, falling back to Streamlit secrets."""
+    if os.getenv("SMTP_USER"):
+        return os.getenv("SMTP_USER"), os.getenv("SMTP_PASSWORD", "")
+    return st.secrets.google.account_email, st.secrets.google.account_password
+
+@functools.lru_cache(maxsize=8)
+def _encoded_attachment(path, mtime):
+    # Keyed by modification time, so an updated waiver is picked up without a restart
+    with open(path, "rb") as attachment_file:
+        return base64.encodebytes(attachment_file.read()).decode("ascii")
+
+def _attachment(payload, filename, subtype="octet-stream", encoded=False):
+    mime_attachment = MIMEBase("application", subtype)
+    mime_attachment.set_payload(payload)
+    if encoded:
+        mime_attachment["Content-Transfer-Encoding"] = "base64"
+    else:
+        encoders.encode_base64(mime_attachment)
+    mime_attachment.add_header("Content-Disposition", "attachment; filename=%s" % filename)
+    return mime_attachment
 
+def BuildOfferEmail(sender_email, applicant_name, applicant_email, job_role, offer_letter, volunteer_waiver):
+    """Offer email with the offer letter (bytes or BytesIO) and the volunteer waiver (path) attached."""
+    applicant_name = re.sub(r'[^a-zA-Z0-9 ]', '', applicant_name)
+    message = MIMEMultipart()
+    message["From"] = sender_email
+    message["To"] = applicant_email
+    message["Subject"] = EMAIL_SUBJECT
+    message.attach(MIMEText(EMAIL_BODY.format(applicant_name=applicant_name), "plain"))
+    offer_letter = offer_letter.getvalue() if hasattr(offer_letter, "getvalue") else offer_letter
+    message.attach(_attachment(offer_letter, f"{applicant_name} CDF Offer Letter - {job_role}.docx"))
+    waiver = _encoded_attachment(volunteer_waiver, os.path.getmtime(volunteer_waiver))
+    message.attach(_attachment(waiver, VOLUNTEER_WAIVER_FILENAME, "vnd.openxmlformats-officedocument.wordprocessingml.document", encoded=True))
+    return message
+
+class SmtpConnectionPool:
+    """Authenticated SMTP connections reused across messages, reconnecting when the server drops one."""
+
+    def __init__(self, server=SMTP_SERVER, port=SMTP_PORT, credentials=None, starttls=SMTP_STARTTLS, timeout=30):
+        self.server = server
+        self.port = port
+        self.credentials = credentials
+        self.starttls = starttls
+        self.timeout = timeout
+        self._idle = queue.LifoQueue()
+
+    def _connect(self):
+        connection = smtplib.SMTP(self.server, self.port, timeout=self.timeout)
+        if self.starttls:
+            connection.starttls()
+        # A local relay without authentication is configured with just the sender address
+        if self.credentials and all(self.credentials):
+            connection.login(*self.credentials)
+        return connection
+
+    def send(self, message):
+        """Sends a message on an idle connection, opening one if none is free. Retries once on a dropped connection."""
+        try:
+            connection = self._idle.get_nowait()
+        except queue.Empty:
+            connection = self._connect()
+        try:
+            try:
+                connection.send_message(message)
+            except smtplib.SMTPServerDisconnected:
+                self._discard(connection)
+                connection = self._connect()
+                connection.send_message(message)
+        except Exception:
+            connection.close()
+            raise
+        self._idle.put(connection)
+
+    @staticmethod
+    def _discard(connection):
         try:
-            st.write("Attaching documents: offer letter, volunteer waiver.")
-            time.sleep(1)
-            mime_attachment = MIMEBase("application", "octet-stream")
-            # Attach offer letter
-            mime_attachment.set_payload(offer_letter.getvalue())
-            encoders.encode_base64(mime_attachment)
-            mime_attachment.add_header(
-                "Content-Disposition",
-                "attachment; filename=%s" % offer_letter_filename,
-            )
-            message.attach(mime_attachment)
-
-            # Attach volunteer waiver
-            mime_attachment = MIMEBase("application", "application/vnd.openxmlformats-officedocument.wordprocessingml.document")
-            with open(volunteer_waiver, "rb") as attachment_file:
-                mime_attachment.set_payload(attachment_file.read())
-
-            encoders.encode_base64(mime_attachment)
-            mime_attachment.add_header(
-                "Content-Disposition",
-                "attachment; filename=%s" % volunteer_waiver_filename,
-            )
-            message.attach(mime_attachment)
-
-            with smtplib.SMTP(smtp_server, port) as server:
-                st.write("Connecting to network!")
-                server.starttls()
-                server.login(sender_email, password)
-                server.sendmail(sender_email, applicant_email, message.as_string())
-                server.quit()
-                status.update(label="Email sent successfully. Deleting offer letter from session for security purposes.", state="complete")
-                return True
+            connection.quit()
+        except (smtplib.SMTPException, OSError):
+            connection.close()
+
+    def close(self):
+        while True:
+            try:
+                connection = self._idle.get_nowait()
+            except queue.Empty:
+                return
+            self._discard(connection)
+
+def SendOfferLetters(offers, volunteer_waiver, pool=None, workers=EMAIL_WORKERS):
+    """
+    Emails offer letters to many applicants over pooled connections, at most `workers` at a time.
+    offers are dicts with name, email, job_role, offer_letter and optionally the analysis status; offers for
+    resumes that failed analysis or without a valid email are not sent. Returns one
+    {"name", "email", "status"} dict per offer, in order; status is "Sent" or the reason it was not.
+    """
+    if pool is None:
+        sender_email, password = GetSmtpCredentials()
+        pool = SmtpConnectionPool(credentials=(sender_email, password))
+    sender_email = pool.credentials[0] if pool.credentials else os.getenv("SMTP_USER", "")
 
+    def send(offer):
+        if offer.get("status", "Success") != "Success":
+            return f"Not sent: resume was not analysed ({offer['status']})"
+        if not IsValidEmail(offer.get("email")):
+            return f"Not sent: invalid applicant email ({offer.get('email') or 'empty'})"
+        try:
+            pool.send(BuildOfferEmail(sender_email, offer["name"], offer["email"].strip(), offer["job_role"], offer["offer_letter"], volunteer_waiver))
+            return "Sent"
         except smtplib.SMTPAuthenticationError:
-            status.update(label="SMTP authentication error. Check username and password", state="error", expanded=False)
+            return "SMTP authentication error. Check username and password"
+        except Exception as e:
+            return f"Error occured when sending email: {str(e)}"
+
+    try:
+        with ThreadPoolExecutor(max_workers=max(1, min(workers, len(offers)))) as executor:
+            statuses = list(executor.map(send, offers))
+    finally:
+        pool.close()
+    return [{"name": offer["name"], "email": offer.get("email"), "status": status} for offer, status in zip(offers, statuses)]
+
+def EmailOfferLetter(offer_letter, volunteer_waiver, applicant_name, applicant_email, job_role):
+    with st.status("Emailing offer letter...", expanded=True) as status:
+        st.write("Fetching authentication details...")
+        sender_email, password = GetSmtpCredentials()
+        if not sender_email or not password:
+            status.update(label=f"Authentication records not found. Set environmental variables/secrets: account_email, account_password", state="error", expanded=False)
+            return False
+        if not IsValidEmail(applicant_email):
+            status.update(label="A valid applicant email is required!", state="error", expanded=False)
             return False
 
-        except Exception as e:
-            status.update(label=f"Error occured when sending email: {str(e)}", state="error", expanded=True)
+        st.write("Connecting to network!")
+        offer = {"name": applicant_name, "email": applicant_email, "job_role": job_role, "offer_letter": offer_letter}
+        report = SendOfferLetters([offer], volunteer_waiver, SmtpConnectionPool(credentials=(sender_email, password)))
+        if report[0]["status"] != "Sent":
+            status.update(label=report[0]["status"], state="error", expanded=True)
             return False
-    
+        status.update(label="Email sent successfully. Deleting offer letter from session for security purposes.", state="complete")
+        return True
+
+""" Offer letter templates """
+# Processes rendering offer letters in bulk
+TEMPLATE_WORKERS = int(os.getenv("TEMPLATE_WORKERS", str(min(4, os.cpu_count() or 1))))
+
+class TemplateIndex:
+    """
+    Offer letter templates of a directory as (job role, filename) pairs. The directory is only listed
+    again when its modification time changes, i.e. when a template is added, removed or renamed.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        self._mtime = None
+        self._templates = []
+        self._lock = threading.Lock()
+
+    def templates(self):
+        """(job role, filename) pairs sorted by job role. Raises FileNotFoundError for a missing directory."""
+        mtime = os.stat(self.directory).st_mtime_ns
+        with self._lock:
+            if mtime != self._mtime:
+                filenames = [file for file in os.listdir(self.directory) if file.endswith(".docx") and os.path.isfile(os.path.join(self.directory, file))]
+                self._templates = sorted((file.split('-')[-1].replace('.docx', '').replace('_', ' '), file) for file in filenames)
+                self._mtime = mtime
+            return self._templates
+
+_template_indexes = {}
+_template_indexes_lock = threading.Lock()
+
+def GetTemplateIndex(directory):
+    """Process-wide template index of a directory."""
+    with _template_indexes_lock:
+        if directory not in _template_indexes:
+            _template_indexes[directory] = TemplateIndex(directory)
+        return _template_indexes[directory]
+
+@functools.lru_cache(maxsize=32)
+def _template_contents(path, mtime):
+    # docxtpl re-parses the document on every render, so the template is kept in memory as bytes
+    with open(path, "rb") as template_file:
+        return template_file.read()
+
+def RenderOfferLetter(offer_letter_template, applicant_name, start_date, job_role, hours_per_week):
+    """Renders an offer letter template into a .docx in memory, without any UI."""
+    context = {
+        'candidate_name': re.sub(r'[^a-zA-Z0-9 ]', '', applicant_name),
+        'role': job_role,
+        'hours': hours_per_week,
+        'start_date': start_date,
+    }
+    tpl = docxtpl.DocxTemplate(BytesIO(_template_contents(offer_letter_template, os.path.getmtime(offer_letter_template))))
+    tpl.render(context)
+    offer_letter_bytes = BytesIO()
+    tpl.save(offer_letter_bytes)
+    offer_letter_bytes.seek(0)
+    return offer_letter_bytes
+
+def _render_offer_letter_bytes(arguments):
+    return RenderOfferLetter(*arguments).getvalue()
+
+def RenderOfferLetters(offer_letter_template, applicant_names, start_date, job_role, hours_per_week, workers=TEMPLATE_WORKERS):
+    """Renders one offer letter per applicant in a process pool. Yields (index, .docx bytes) as letters complete."""
+    arguments = [(offer_letter_template, applicant_name, start_date, job_role, hours_per_week) for applicant_name in applicant_names]
+    if workers <= 1 or len(arguments) <= 1:
+        for index, letter_arguments in enumerate(arguments):
+            yield index, _render_offer_letter_bytes(letter_arguments)
+        return
+    # Long-lived pool, started without forking the app's threads
+    futures = {SubmitToProcessPool("templates", workers, _render_offer_letter_bytes, letter_arguments): index for index, letter_arguments in enumerate(arguments)}
+    for future in as_completed(futures):
+        yield futures[future], future.result()
+
+def OfferLettersZip(offer_letter_template, applicant_names, start_date, job_role, hours_per_week, workers=TEMPLATE_WORKERS):
+    """Renders offer letters for many applicants and writes them into one zip archive as they complete."""
+    archive_bytes = BytesIO()
+    # .docx files are already deflated, so they are stored as they are
+    with zipfile.ZipFile(archive_bytes, "w", compression=zipfile.ZIP_STORED) as archive:
+        for index, letter in RenderOfferLetters(offer_letter_template, applicant_names, start_date, job_role, hours_per_week, workers):
+            applicant_name = re.sub(r'[^a-zA-Z0-9 ]', '', applicant_names[index])
+            archive.writestr(f"{index + 1:03d} {applicant_name} CDF Offer Letter - {job_role}.docx", letter)
+    return archive_bytes.getvalue()
 
 def GenerateOfferLetter(offer_letter_template, applicant_name, start_date, job_role, hours_per_week):
     
     with st.status("Tailoring document...", expanded=True) as status:
         """Generates an offer letter from a template."""
         st.write("Fetching template...")
-        time.sleep(1)
-
         if not os.path.exists(offer_letter_template):
             status.update(label="No file found! Please add a file in a valid .docx format.", state="error", expanded=False)
             return None
 
-        st.write("Processing input fields.")
-        time.sleep(1)
-        applicant_name = re.sub(r'[^a-zA-Z0-9 ]', '', applicant_name)
-        context = {
-            'candidate_name': applicant_name,
-            'role': job_role,
-            'hours': hours_per_week,
-        }
-
-        context['start_date'] = start_date
         st.write("Filling in the details.")
-        time.sleep(1)
         try:
-            # Read the content of the uploaded file
-            tpl = DocxTemplate(offer_letter_template)
-            tpl.render(context)
-
-            offer_letter_bytes = BytesIO()
-
-            tpl.save(offer_letter_bytes)
-            offer_letter_bytes.seek(0)
+            offer_letter_bytes = RenderOfferLetter(offer_letter_template, applicant_name, start_date, job_role, hours_per_week)
             status.update(label="Generation complete!", state="complete")
             return offer_letter_bytes
 
@@ -0,0 +1,150 @@
+import functools
+import json
+import os
+import re
+import threading
+import zlib
+from .lazy import LazyModule
+from .store import FileLock
+
+np = LazyModule("numpy")
+
+DEDUP_DIR = os.getenv("DEDUP_DIR", "./.cache/dedup")
+# Estimated Jaccard similarity of word shingles above which two resumes are the same document
+DEDUP_THRESHOLD = float(os.getenv("DEDUP_THRESHOLD", "0.9"))
+SHINGLE_SIZE = 5
+# Texts with fewer distinct shingles (empty text of scanned PDFs, a few words) are too short to fingerprint
+DEDUP_MIN_SHINGLES = int(os.getenv("DEDUP_MIN_SHINGLES", "10"))
+MINHASH_PERMUTATIONS = 64
+# Signatures are split into bands for locality sensitive hashing; documents sharing a band are compared
+LSH_BANDS = 16
+
+WORD_PATTERN = re.compile(r"\w+")
+# Universal hashing (a * x + b) mod p, one (a, b) per permutation, fixed so signatures persist across runs
+MERSENNE_PRIME = (1 << 61) - 1
+
+@functools.lru_cache(maxsize=None)
+def _permutations():
+    generator = np.random.default_rng(1)
+    a = generator.integers(1, 1 << 32, size=MINHASH_PERMUTATIONS, dtype=np.uint64)
+    b = generator.integers(0, 1 << 32, size=MINHASH_PERMUTATIONS, dtype=np.uint64)
+    return a, b
+
+def Shingles(text, size=SHINGLE_SIZE):
+    """32-bit hashes of every run of size consecutive words, case and punctuation ignored."""
+    words = WORD_PATTERN.findall(text.lower())
+    return {zlib.crc32(" ".join(words[start:start + size]).encode("utf-8")) for start in range(len(words) - size + 1)}
+
+def MinHashSignature(shingles):
+    """MinHash signature of a non-empty shingle set; the share of equal entries estimates their Jaccard similarity."""
+    a, b = _permutations()
+    shingles = np.fromiter(shingles, dtype=np.uint64)
+    # a and x are below 2**32, so a * x + b fits in 64 bits before the modulo
+    return ((np.outer(shingles, a) + b) % MERSENNE_PRIME).min(axis=0)
+
+class DuplicateIndex:
+    """
+    MinHash signatures of every resume text seen so far, keyed by the hash of the uploaded file, with LSH
+    bands for sub-linear lookup. Signatures are appended to a raw uint64 matrix, so the index survives restarts;
+    like the candidate store it may be shared between processes, with writes under a file lock.
+    """
+
+    def __init__(self, directory=DEDUP_DIR, threshold=DEDUP_THRESHOLD, min_shingles=DEDUP_MIN_SHINGLES):
+        self.threshold = threshold
+        self.min_shingles = max(1, min_shingles)
+        os.makedirs(directory, exist_ok=True)
+        self._keys_path = os.path.join(directory, "files.jsonl")
+        self._signatures_path = os.path.join(directory, "signatures.u64")
+        self._lock_path = os.path.join(directory, "dedup.lock")
+        self._lock = threading.Lock()
+        self._keys = []
+        # Bytes of files.jsonl read into _keys
+        self._keys_offset = 0
+        self._signatures = []
+        self._bands = {}
+        with self._lock, FileLock(self._lock_path, exclusive=False):
+            self._refresh()
+
+    def _refresh(self):
+        # Reads signatures appended since the last refresh, by this or another process. Needs the file lock
+        if not os.path.exists(self._keys_path) or os.path.getsize(self._keys_path) == self._keys_offset:
+            return
+        # Keys and signatures are written separately; keep only rows present in both
+        stored_rows = os.path.getsize(self._signatures_path) // (8 * MINHASH_PERMUTATIONS) if os.path.exists(self._signatures_path) else 0
+        with open(self._keys_path, "rb") as f:
+            f.seek(self._keys_offset)
+            lines = f.read().split(b"\n")[:-1]
+        rows = len(self._keys)
+        if stored_rows <= rows:
+            return
+        matrix = np.fromfile(self._signatures_path, dtype=np.uint64, offset=rows * 8 * MINHASH_PERMUTATIONS,
+                             count=(stored_rows - rows) * MINHASH_PERMUTATIONS).reshape(-1, MINHASH_PERMUTATIONS)
+        for line, signature in zip(lines, matrix):
+            try:
+                key = json.loads(line)
+            except json.JSONDecodeError:
+                # Half-written line from an interrupted append
+                break
+            self._insert(key, signature)
+            self._keys_offset += len(line) + 1
+
+    def __len__(self):
+        return len(self._keys)
+
+    def _band_keys(self, signature):
+        rows = MINHASH_PERMUTATIONS // LSH_BANDS
+        return [(band, signature[band * rows:(band + 1) * rows].tobytes()) for band in range(LSH_BANDS)]
+
+    def _insert(self, key, signature):
+        row = len(self._keys)
+        self._keys.append(key)
+        self._signatures.append(signature)
+        for band_key in self._band_keys(signature):
+            self._bands.setdefault(band_key, []).append(row)
+
+    def _find(self, signature):
+        rows = {row for band_key in self._band_keys(signature) for row in self._bands.get(band_key, ())}
+        best_key, best_similarity = None, self.threshold
+        for row in rows:
+            similarity = float((self._signatures[row] == signature).mean())
+            if similarity >= best_similarity:
+                best_key, best_similarity = self._keys[row], similarity
+        return (best_key, best_similarity) if best_key is not None else None
+
+    def match_or_add(self, file_hash, text):
+        """
+        Returns (file_hash, similarity) of the closest earlier resume at or above the threshold. Otherwise the
+        text is indexed under file_hash and None is returned, so later near-duplicates resolve to it.
+        Texts with fewer than min_shingles shingles are neither matched nor indexed.
+        """
+        shingles = Shingles(text)
+        if len(shingles) < self.min_shingles:
+            return None
+        signature = MinHashSignature(shingles)
+        with self._lock, FileLock(self._lock_path):
+            self._refresh()
+            match = self._find(signature)
+            if match is not None:
+                return match
+            with open(self._signatures_path, "ab") as f:
+                # Truncate any partial tail left behind by a crash before appending
+                f.truncate(len(self._keys) * MINHASH_PERMUTATIONS * 8)
+                f.write(signature.tobytes())
+            line = (json.dumps(file_hash) + "\n").encode("utf-8")
+            with open(self._keys_path, "ab") as f:
+                f.truncate(self._keys_offset)
+                f.write(line)
+            self._keys_offset += len(line)
+            self._insert(file_hash, signature)
+            return None
+
+_duplicate_index = None
+_duplicate_index_lock = threading.Lock()
+
+def GetDuplicateIndex():
+    """Process-wide duplicate index, loaded on first use."""
+    global _duplicate_index
+    with _duplicate_index_lock:
+        if _duplicate_index is None:
+            _duplicate_index = DuplicateIndex()
+        return _duplicate_index
@@ -0,0 +1,252 @@
+import os
+import psutil
+import shutil
+import threading
+import time
+import types
+from .lazy import LazyModule
+
+# torch and transformers take seconds to import; defer them until a model is needed
+np = LazyModule("numpy")
+torch = LazyModule("torch")
+transformers = LazyModule("transformers")
+
+DEFAULT_EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", "sentence-transformers/all-MiniLM-L6-v2")
+
+""" Inference backends """
+# torch: full precision PyTorch (reference), torch-int8: dynamically quantised Linear layers,
+# onnx: exported graph run by ONNX Runtime (onnx exports the graph, onnxruntime runs it)
+BACKENDS = ("torch", "torch-int8", "onnx")
+EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "torch")
+# Intra-op threads per forward pass, 0 keeps the library default
+EMBEDDING_THREADS = int(os.getenv("EMBEDDING_THREADS", "0"))
+# Exported ONNX models are built once and reused from here
+ARTEFACT_DIR = os.getenv("EMBEDDING_ARTEFACT_DIR", "./.cache/models")
+
+def _artefact_path(model_name, suffix):
+    os.makedirs(ARTEFACT_DIR, exist_ok=True)
+    return os.path.join(ARTEFACT_DIR, model_name.replace("/", "__") + suffix)
+
+def _load_torch_model(model_name):
+    if EMBEDDING_THREADS:
+        torch.set_num_threads(EMBEDDING_THREADS)
+    model = transformers.AutoModel.from_pretrained(model_name)
+    model.eval()
+    for parameter in model.parameters():
+        parameter.requires_grad_(False)
+    return model
+
+def _load_int8_model(model_name):
+    # Dynamic quantisation is deterministic for given fp32 weights, so it is redone on load rather than cached
+    return torch.ao.quantization.quantize_dynamic(_load_torch_model(model_name), {torch.nn.Linear}, dtype=torch.qint8)
+
+class OnnxEmbeddingModel:
+    """ONNX Runtime session behind the same call interface as a transformers model."""
+
+    def __init__(self, path, config, threads=EMBEDDING_THREADS):
+        try:
+            import onnxruntime
+        except ImportError:
+            raise ImportError("The onnx embedding backend needs the onnxruntime package.")
+        options = onnxruntime.SessionOptions()
+        if threads:
+            options.intra_op_num_threads = threads
+        self.session = onnxruntime.InferenceSession(path, options, providers=["CPUExecutionProvider"])
+        self.config = config
+
+    def __call__(self, input_ids, attention_mask, **unused_inputs):
+        last_hidden_state, = self.session.run(
+            ["last_hidden_state"],
+            {"input_ids": input_ids.numpy().astype(np.int64), "attention_mask": attention_mask.numpy().astype(np.int64)},
+        )
+        return types.SimpleNamespace(last_hidden_state=torch.from_numpy(last_hidden_state))
+
+def _export_onnx_model(model_name, tokenizer, path):
+    class LastHiddenState(torch.nn.Module):
+        def __init__(self, model):
+            super().__init__()
+            self.model = model
+
+        def forward(self, input_ids, attention_mask):
+            return self.model(input_ids=input_ids, attention_mask=attention_mask).last_hidden_state
+
+    # The exporter may write weights next to the graph, so export into a scratch directory and rename it into place
+    partial_path = path + ".partial"
+    shutil.rmtree(partial_path, ignore_errors=True)
+    os.makedirs(partial_path)
+    inputs = tokenizer(["export"], return_tensors="pt")
+    dynamic_axes = {0: "batch", 1: "sequence"}
+    torch.onnx.export(
+        LastHiddenState(_load_torch_model(model_name)),
+        (inputs["input_ids"], inputs["attention_mask"]),
+        os.path.join(partial_path, "model.onnx"),
+        input_names=["input_ids", "attention_mask"],
+        output_names=["last_hidden_state"],
+        dynamic_axes={"input_ids": dynamic_axes, "attention_mask": dynamic_axes, "last_hidden_state": dynamic_axes},
+    )
+    os.replace(partial_path, path)
+
+def _load_onnx_model(model_name, tokenizer):
+    path = _artefact_path(model_name, ".onnx")
+    if not os.path.exists(path):
+        _export_onnx_model(model_name, tokenizer, path)
+    return OnnxEmbeddingModel(os.path.join(path, "model.onnx"), transformers.AutoConfig.from_pretrained(model_name))
+
+""" Model registry """
+# One (tokenizer, model) pair per model name and backend for the whole process. Streamlit runs
+# every session in its own script thread, so loading is serialised behind a lock.
+_MODEL_REGISTRY = {}
+_MODEL_STATS = {}
+_REGISTRY_LOCK = threading.Lock()
+
+def LoadEmbeddingModel(model_name=DEFAULT_EMBEDDING_MODEL, backend=None):
+    """Returns the cached (tokenizer, model) pair, loading it on first use."""
+    backend = backend or EMBEDDING_BACKEND
+    registry_key = f"{model_name} [{backend}]"
+    entry = _MODEL_REGISTRY.get(registry_key)
+    if entry is not None:
+        return entry
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown embedding backend '{backend}', expected one of {', '.join(BACKENDS)}.")
+
+    with _REGISTRY_LOCK:
+        # Another thread may have finished loading while we waited on the lock
+        entry = _MODEL_REGISTRY.get(registry_key)
+        if entry is not None:
+            return entry
+
+        process = psutil.Process()
+        rss_before = process.memory_info().rss
+        start = time.perf_counter()
+
+        tokenizer = transformers.AutoTokenizer.from_pretrained(model_name)
+        if backend == "torch-int8":
+            model = _load_int8_model(model_name)
+        elif backend == "onnx":
+            model = _load_onnx_model(model_name, tokenizer)
+        else:
+            model = _load_torch_model(model_name)
+
+        _MODEL_STATS[registry_key] = {
+            "load_time": time.perf_counter() - start,
+            "memory_consumed": (process.memory_info().rss - rss_before) / (1024 ** 2),
+            "warmed_up": False,
+        }
+        entry = (tokenizer, model)
+        _MODEL_REGISTRY[registry_key] = entry
+        return entry
+
+def WarmUpModel(model_name=DEFAULT_EMBEDDING_MODEL, backend=None):
+    """Loads the model and runs a single forward pass so the first real request is not slowed down."""
+    backend = backend or EMBEDDING_BACKEND
+    tokenizer, model = LoadEmbeddingModel(model_name, backend)
+    stats = _MODEL_STATS[f"{model_name} [{backend}]"]
+    if stats["warmed_up"]:
+        return
+
+    start = time.perf_counter()
+    with torch.inference_mode():
+        model(**tokenizer(["warm up"], return_tensors="pt", padding=True, truncation=True))
+    stats["warm_up_time"] = time.perf_counter() - start
+    stats["warmed_up"] = True
+
+_warm_up_thread = None
+WARM_UP_MODELS = os.getenv("WARM_UP_MODELS", "1") != "0"
+
+def WarmUpModelsInBackground(model_names=(DEFAULT_EMBEDDING_MODEL,)):
+    """Starts warming up the models on a daemon thread, once per process."""
+    global _warm_up_thread
+    if not WARM_UP_MODELS:
+        return None
+    with _REGISTRY_LOCK:
+        if _warm_up_thread is not None:
+            return _warm_up_thread
+
+        def warm_up():
+            for model_name in model_names:
+                try:
+                    WarmUpModel(model_name)
+                except Exception as e:
+                    # Loading is retried on first use; the app must still render. The error shows in GetModelStats
+                    # until a later load of the model succeeds
+                    _MODEL_STATS.setdefault(f"{model_name} [{EMBEDDING_BACKEND}]", {"warmed_up": False})["warm_up_error"] = str(e)
+
+        _warm_up_thread = threading.Thread(target=warm_up, name="model-warm-up", daemon=True)
+        _warm_up_thread.start()
+        return _warm_up_thread
+
+def GetModelStats():
+    """Returns load time and resident memory of every loaded model, and the error of any failed warm up."""
+    return {model_name: dict(stats) for model_name, stats in _MODEL_STATS.items()}
+
+""" Embedding engine """
+# Texts longer than the model window are split into overlapping windows instead of being truncated.
+# A text that fits in one window gets exactly the same embedding as without chunking.
+EMBEDDING_CHUNKING = os.getenv("EMBEDDING_CHUNKING", "1") != "0"
+CHUNK_OVERLAP = int(os.getenv("EMBEDDING_CHUNK_OVERLAP", "64"))
+CHUNK_POOLING = os.getenv("EMBEDDING_CHUNK_POOLING", "mean")
+
+def EmbedTexts(texts, model_name=DEFAULT_EMBEDDING_MODEL, batch_size=32, chunking=EMBEDDING_CHUNKING,
+               window=None, overlap=CHUNK_OVERLAP, pooling=CHUNK_POOLING, backend=None):
+    """
+    Embeds a list of texts in padded mini-batches and returns an L2-normalised float32 matrix (one row per text).
+    With chunking, every text is cut into overlapping token windows; the windows of all texts share the same
+    forward passes and are aggregated per text with mean or max pooling.
+    backend selects the inference backend (see BACKENDS), EMBEDDING_BACKEND by default.
+    """
+    if pooling not in ("mean", "max"):
+        raise ValueError(f"Unknown pooling '{pooling}', expected 'mean' or 'max'.")
+    tokenizer, model = LoadEmbeddingModel(model_name, backend)
+    embeddings = np.zeros((len(texts), model.config.hidden_size), dtype=np.float32)
+    if not texts:
+        return embeddings
+
+    # Window length including [CLS]/[SEP], bounded by the model's position embeddings
+    max_length = min(tokenizer.model_max_length, model.config.max_position_embeddings)
+    max_length = min(window, max_length) if window else max_length
+    # The tokenizer emits the overflow of each text as extra windows sharing `overlap` tokens with the previous one
+    stride = min(overlap, max_length // 4) if chunking else 0
+    encoded = tokenizer(list(texts), truncation=True, max_length=max_length, stride=stride, return_overflowing_tokens=chunking)
+    sequences = encoded["input_ids"]
+    documents = encoded["overflow_to_sample_mapping"] if chunking else list(range(len(texts)))
+
+    # Batch windows of similar length together, regardless of which text they belong to, to keep padding small
+    window_embeddings = np.zeros((len(sequences), model.config.hidden_size), dtype=np.float32)
+    order = sorted(range(len(sequences)), key=lambda index: len(sequences[index]))
+    with torch.inference_mode():
+        for start in range(0, len(order), batch_size):
+            batch_indices = order[start:start + batch_size]
+            inputs = tokenizer.pad({"input_ids": [sequences[index] for index in batch_indices]}, return_tensors="pt")
+            hidden_state = model(**inputs).last_hidden_state
+
+            # Mean pooling over real tokens only, padding is masked out
+            mask = inputs["attention_mask"].unsqueeze(-1).to(hidden_state.dtype)
+            pooled = (hidden_state * mask).sum(dim=1) / mask.sum(dim=1).clamp(min=1e-9)
+            pooled = torch.nn.functional.normalize(pooled, p=2, dim=1)
+            window_embeddings[batch_indices] = pooled.numpy()
+
+    documents = np.asarray(documents)
+    if pooling == "max":
+        embeddings.fill(-np.inf)
+        np.maximum.at(embeddings, documents, window_embeddings)
+    else:
+        np.add.at(embeddings, documents, window_embeddings)
+    embeddings /= np.maximum(np.linalg.norm(embeddings, axis=1, keepdims=True), 1e-12)
+    return embeddings
+
+def ScoreEmbeddings(document_embeddings, query_embedding):
+    """Cosine similarity of every row against the query. Both inputs are expected to be L2-normalised."""
+    return document_embeddings @ query_embedding
+
+def CheckBackendParity(backend, texts, model_name=DEFAULT_EMBEDDING_MODEL, tolerance=0.02):
+    """Compares pairwise similarity scores of a backend against full precision PyTorch on the given texts."""
+    reference = EmbedTexts(texts, model_name, backend="torch")
+    candidate = EmbedTexts(texts, model_name, backend=backend)
+    score_difference = float(np.abs(reference @ reference.T - candidate @ candidate.T).max())
+    return {
+        "backend": backend,
+        "max_score_difference": score_difference,
+        "min_embedding_cosine": float((reference * candidate).sum(axis=1).min()),
+        "tolerance": tolerance,
+        "within_tolerance": score_difference <= tolerance,
+    }
@@ -0,0 +1,84 @@
+import hashlib
+import json
+import os
+import random
+import re
+import time
+
+# Simulated request latency in seconds: base + uniform jitter, reproducible per input text
+FAKE_LLM_LATENCY = float(os.getenv("FAKE_LLM_LATENCY", "0.0"))
+FAKE_LLM_JITTER = float(os.getenv("FAKE_LLM_JITTER", "0.0"))
+# Share of candidates a batched response leaves out, to exercise the retry path
+FAKE_LLM_BATCH_FAILURE_RATE = float(os.getenv("FAKE_LLM_BATCH_FAILURE_RATE", "0.0"))
+
+SKILL_VOCABULARY = (
+    "Python", "SQL", "Java", "JavaScript", "TypeScript", "React", "Node.js", "Go", "C++", "Docker", "Kubernetes",
+    "AWS", "Azure", "GCP", "PyTorch", "TensorFlow", "Pandas", "Spark", "Airflow", "Tableau", "Excel", "Git",
+    "Machine Learning", "Data Analysis", "Project Management", "Communication", "Leadership", "Teamwork",
+)
+DEGREES = ("Doctorate", "Masters", "Bachelors", "Associate")
+TITLES = ("Software Engineer", "Data Scientist", "Data Analyst", "Product Manager", "DevOps Engineer", "Designer")
+YEARS_PATTERN = re.compile(r"(\d{1,2})\+?\s+years", re.IGNORECASE)
+
+def _fake_analysis(text, generator):
+    lowered = text.lower()
+    skills = [skill for skill in SKILL_VOCABULARY if skill.lower() in lowered] or generator.sample(SKILL_VOCABULARY, 5)
+    years = YEARS_PATTERN.search(text)
+    years = int(years.group(1)) if years else generator.randint(0, 15)
+    education = next((degree for degree in DEGREES if degree.lower() in lowered), generator.choice(DEGREES))
+    strengths = generator.sample(skills, min(3, len(skills)))
+    return {
+        "skills": skills,
+        "experience_years": years,
+        "title": generator.choice(TITLES),
+        "education": education,
+        "strengths": [f"Strong {strength} expertise" for strength in strengths],
+        "weaknesses": [f"Limited exposure to {generator.choice(SKILL_VOCABULARY)}"],
+    }
+
+def _generator(text):
+    return random.Random(hashlib.sha256(text.encode("utf-8")).digest())
+
+def FakeGeminiResponse(text, latency=None, jitter=None):
+    """
+    Deterministic local stand-in for the Gemini analysis, in the same format as the prompt asks for.
+    Skills, experience and education are read from the text where present, the rest is derived from its hash.
+    """
+    latency = FAKE_LLM_LATENCY if latency is None else latency
+    jitter = FAKE_LLM_JITTER if jitter is None else jitter
+    generator = _generator(text)
+    if latency or jitter:
+        time.sleep(latency + generator.uniform(0, jitter))
+
+    analysis = _fake_analysis(text, generator)
+    return (
+        f"Skills: {', '.join(analysis['skills'])}\n\n"
+        f"Experience: {analysis['experience_years']} years, {analysis['title']}\n\n"
+        f"Education: {analysis['education']}\n"
+        "Strengths:\n" + "\n".join(f"- {strength}" for strength in analysis["strengths"]) + "\n"
+        "Weaknesses:\n" + "\n".join(f"- {weakness}" for weakness in analysis["weaknesses"])
+    )
+
+def FakeGeminiBatchResponse(documents, latency=None, jitter=None, failure_rate=None):
+    """
+    Stand-in for a batched Gemini request: documents is a list of (id, text), the reply a JSON array with one
+    analysis per id. One request costs one latency; with failure_rate some candidates are left out.
+    """
+    latency = FAKE_LLM_LATENCY if latency is None else latency
+    jitter = FAKE_LLM_JITTER if jitter is None else jitter
+    failure_rate = FAKE_LLM_BATCH_FAILURE_RATE if failure_rate is None else failure_rate
+    generator = _generator("".join(text for _, text in documents))
+    if latency or jitter:
+        time.sleep(latency + generator.uniform(0, jitter))
+
+    analyses = []
+    for document_id, text in documents:
+        # Independent of the texts, so a retried candidate can succeed
+        if failure_rate and random.random() < failure_rate:
+            continue
+        document_generator = _generator(text)
+        # Same draws as FakeGeminiResponse, so both modes describe a resume the same way
+        if latency or jitter:
+            document_generator.uniform(0, jitter)
+        analyses.append({"id": document_id, **_fake_analysis(text, document_generator)})
+    return json.dumps(analyses)
@@ -0,0 +1,172 @@
+import collections
+import os
+import random
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from .lazy import LazyModule
+
+genai = LazyModule("google.generativeai")
+
+# Quota of the plan in use (Free tier of gemini-1.5-flash by default)
+GEMINI_REQUESTS_PER_MINUTE = float(os.getenv("GEMINI_REQUESTS_PER_MINUTE", "15"))
+GEMINI_TOKENS_PER_MINUTE = float(os.getenv("GEMINI_TOKENS_PER_MINUTE", "1000000"))
+# Per-request timeout and retries with exponential backoff and full jitter
+GEMINI_TIMEOUT = float(os.getenv("GEMINI_TIMEOUT", "60"))
+GEMINI_MAX_RETRIES = int(os.getenv("GEMINI_MAX_RETRIES", "5"))
+GEMINI_BACKOFF_BASE = float(os.getenv("GEMINI_BACKOFF_BASE", "1.0"))
+GEMINI_BACKOFF_MAX = float(os.getenv("GEMINI_BACKOFF_MAX", "32.0"))
+# A second, hedged request is sent when the first has not answered after this many seconds (0 disables hedging)
+GEMINI_HEDGE_AFTER = float(os.getenv("GEMINI_HEDGE_AFTER", "0"))
+
+# Errors worth retrying, by class name so google.api_core is not imported up front. Subclasses match too,
+# e.g. ConnectionResetError and BrokenPipeError (ConnectionError) or requests' ReadTimeout (Timeout)
+RETRYABLE_ERRORS = {
+    "ResourceExhausted", "TooManyRequests", "ServiceUnavailable", "InternalServerError",
+    "DeadlineExceeded", "GatewayTimeout", "ServerError", "TimeoutError", "ConnectionError", "Timeout",
+}
+
+def IsRetryable(error):
+    return any(cls.__name__ in RETRYABLE_ERRORS for cls in type(error).__mro__)
+# Rough size of a request, used for the token bucket and to pack resumes under a token budget
+CHARACTERS_PER_TOKEN = 4
+
+class TokenBucket:
+    """Refills at rate_per_minute up to one minute's worth; acquire blocks until the amount is available."""
+
+    def __init__(self, rate_per_minute):
+        self.rate = rate_per_minute / 60.0
+        self.capacity = rate_per_minute
+        self._level = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now):
+        self._level = min(self.capacity, self._level + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def acquire(self, amount=1):
+        amount = min(amount, self.capacity)
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._refill(now)
+                if self._level >= amount:
+                    self._level -= amount
+                    return
+                wait_time = (amount - self._level) / self.rate
+            time.sleep(wait_time)
+
+    def adjust(self, amount):
+        """Charges (or refunds, when negative) a correction once the real usage is known. The level may go negative."""
+        with self._lock:
+            self._refill(time.monotonic())
+            self._level = min(self.capacity, self._level - amount)
+
+class GeminiClient:
+    """
+    Long-lived Gemini model shared by all threads. Requests pass a requests/min and a tokens/min bucket, are
+    retried with exponential backoff and jitter on rate limits and server errors, and can be hedged.
+    """
+
+    def __init__(self, model_name, api_key=None, model=None,
+                 requests_per_minute=GEMINI_REQUESTS_PER_MINUTE, tokens_per_minute=GEMINI_TOKENS_PER_MINUTE,
+                 timeout=GEMINI_TIMEOUT, max_retries=GEMINI_MAX_RETRIES, hedge_after=GEMINI_HEDGE_AFTER):
+        if model is None:
+            genai.configure(api_key=api_key)
+            model = genai.GenerativeModel(model_name)
+        self.model_name = model_name
+        self.model = model
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.hedge_after = hedge_after
+        self._requests = TokenBucket(requests_per_minute)
+        self._tokens = TokenBucket(tokens_per_minute)
+        self._hedge_pool = ThreadPoolExecutor(max_workers=8, thread_name_prefix="gemini-hedge") if hedge_after else None
+        self._lock = threading.Lock()
+        self._latencies = collections.deque(maxlen=1000)
+        self._counters = collections.Counter()
+
+    def _count(self, **increments):
+        with self._lock:
+            self._counters.update(increments)
+
+    def _request(self, prompt, generation_config, estimated_tokens):
+        self._requests.acquire()
+        self._tokens.acquire(estimated_tokens)
+        start = time.perf_counter()
+        response = self.model.generate_content(prompt, generation_config=generation_config, request_options={"timeout": self.timeout})
+        latency = time.perf_counter() - start
+        usage = getattr(response, "usage_metadata", None)
+        with self._lock:
+            self._latencies.append(latency)
+            self._counters["requests"] += 1
+            if usage is not None:
+                self._counters["prompt_tokens"] += usage.prompt_token_count or 0
+                self._counters["response_tokens"] += usage.candidates_token_count or 0
+        if usage is not None:
+            self._tokens.adjust((usage.total_token_count or 0) - estimated_tokens)
+        return response
+
+    def _hedged_request(self, prompt, generation_config, estimated_tokens):
+        primary = self._hedge_pool.submit(self._request, prompt, generation_config, estimated_tokens)
+        done, _ = wait([primary], timeout=self.hedge_after)
+        if done:
+            return primary.result()
+        self._count(hedges=1)
+        hedge = self._hedge_pool.submit(self._request, prompt, generation_config, estimated_tokens)
+        pending = {primary, hedge}
+        error = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    if future is hedge:
+                        self._count(hedge_wins=1)
+                    return future.result()
+                error = future.exception()
+        raise error
+
+    def generate(self, prompt, generation_config=None, max_output_tokens=0):
+        """Returns the model response for a prompt. Raises the last error once retries are exhausted."""
+        estimated_tokens = len(prompt) // CHARACTERS_PER_TOKEN + max_output_tokens
+        for attempt in range(self.max_retries + 1):
+            try:
+                if self._hedge_pool is not None:
+                    return self._hedged_request(prompt, generation_config, estimated_tokens)
+                return self._request(prompt, generation_config, estimated_tokens)
+            except Exception as e:
+                if not IsRetryable(e) or attempt == self.max_retries:
+                    self._count(errors=1)
+                    raise
+                self._count(retries=1)
+                time.sleep(random.uniform(0, min(GEMINI_BACKOFF_MAX, GEMINI_BACKOFF_BASE * 2 ** attempt)))
+
+    def stats(self):
+        """Request, retry, hedge and token counters with p50/p95 latency in seconds."""
+        with self._lock:
+            latencies = sorted(self._latencies)
+            stats = dict(self._counters)
+        for percentile in (50, 95):
+            stats[f"latency_p{percentile}"] = latencies[min(len(latencies) - 1, len(latencies) * percentile // 100)] if latencies else None
+        return stats
+
+# model name -> (api key, client)
+_clients = {}
+_clients_lock = threading.Lock()
+
+def GetGeminiClient(model_name, api_key):
+    """
+    Process-wide client per model, created on first use and replaced when the API key changes (e.g. a rotated
+    secret). google.generativeai keeps its configured key process-wide, so the latest key serves every model.
+    """
+    with _clients_lock:
+        if model_name not in _clients or _clients[model_name][0] != api_key:
+            _clients[model_name] = (api_key, GeminiClient(model_name, api_key))
+        return _clients[model_name][1]
+
+def GetGeminiStats():
+    """Stats of the current client of every model, by model name."""
+    with _clients_lock:
+        clients = {model_name: client for model_name, (_, client) in _clients.items()}
+    return {model_name: client.stats() for model_name, client in clients.items()}
@@ -1,13 +1,23 @@
-import google.generativeai as genai
+import json
 import os
-import pandas as pd
 import psutil
-import PyPDF2
-import re
 import streamlit as st
-import torch
-from sklearn.metrics.pairwise import cosine_similarity
-from transformers import AutoTokenizer, AutoModelForSequenceClassification, AutoModel
+from .cache import CacheKey, GetResponseCache
+from .embeddings import ScoreEmbeddings, GetModelStats, DEFAULT_EMBEDDING_MODEL, EMBEDDING_BACKEND
+from .inference import EmbedTextsShared, GetEmbeddingServerStats
+from .fake_llm import FakeGeminiResponse, FakeGeminiBatchResponse
+from .gemini import GetGeminiClient, GetGeminiStats, CHARACTERS_PER_TOKEN
+from .lazy import LazyModule
+from .metrics import RecordLLMUsage
+from .parser import ParseAnalysis, ParseContact, ValidateAnalysisRecord
+
+# Heavy dependencies are imported on first use, not when the app starts
+genai = LazyModule("google.generativeai")
+pd = LazyModule("pandas")
+PyPDF2 = LazyModule("PyPDF2")
+
+# Upload limit per batch. Candidates are persisted, so history is not bound by it
+MAX_RESUMES = int(os.getenv("MAX_RESUMES", "200"))
 
 """ Documents upload verification"""
 def VerifyInputRequirements(resumes_list, job_description):
@@ -15,8 +25,8 @@ def VerifyInputRequirements(resumes_list, job_description):
         st.error("No resumes uploaded.")
         return False
 
-    elif len(resumes_list) > 10:
-        st.error("Upload only upto 10 resumes.")
+    elif len(resumes_list) > MAX_RESUMES:
+        st.error(f"Upload only upto {MAX_RESUMES} resumes.")
         return False
 
     elif not job_description:
@@ -26,70 +36,48 @@ def VerifyInputRequirements(resumes_list, job_description):
     return True
 
 """ Text processor functions """
-def ReadFromPDF(pdf_file):
-    pdf_reader = PyPDF2.PdfReader(pdf_file)
-    text = ''.join(page.extract_text() for page in pdf_reader.pages)
-    return text
+# Only the start of a resume reaches the LLM prompt and the embedding model, so extraction stops early
+PDF_CHARACTER_BUDGET = int(os.getenv("PDF_CHARACTER_BUDGET", "20000"))
+PDF_PAGE_BUDGET = int(os.getenv("PDF_PAGE_BUDGET", "10"))
 
-def ReadFromText(text_file):
-    return text_file.getvalue().decode("utf-8")
+def IterPDFPages(pdf_file):
+    """Yields the text of each page, parsing pages only as they are consumed."""
+    pdf_reader = PyPDF2.PdfReader(pdf_file)
+    for page in pdf_reader.pages:
+        yield page.extract_text() or ''
 
-def TextToCommaSeperated(text):
-    text = text.lower()
-    text = re.sub(r"\*", "", text)
-    # Remove subheadings (Skills, Experience, Education)
-    text = re.sub(r"(skills|experience|education):", "", text)
-    text = re.sub(r"[.,:]", ",", text)
-    text = re.sub(r"\s+", " ", text).strip()
-    text = re.sub(r",\s*", ",", text)
+def ReadFromPDF(pdf_file, max_characters=PDF_CHARACTER_BUDGET, max_pages=PDF_PAGE_BUDGET):
+    pages = []
+    characters = 0
+    for page_number, page_text in enumerate(IterPDFPages(pdf_file), start=1):
+        pages.append(page_text)
+        characters += len(page_text)
+        if (max_characters and characters >= max_characters) or (max_pages and page_number >= max_pages):
+            break
+    text = ''.join(pages)
+    return text[:max_characters] if max_characters else text
 
-    return text
+def ReadFromText(text_file):
+    # str() also decodes the memoryview of a SpilledFile
+    return str(text_file.getvalue(), "utf-8")
 
 """ Text extractor functions """
 def PersonalInformationExtractor(text):
-    # Regex patterns for email and phone
-    email_pattern = r'[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}'
-    phone_pattern = r'\+?\d[\d -]{8,12}\d'
-
-    # Attempt to extract contact details
-    email = re.search(email_pattern, text)
-    phone = re.search(phone_pattern, text)
-
-    # Extract Name (assuming first line of the resume might be the name)
-    name = text.splitlines()[0].strip() if text else "Name Not Found"
-
-    return {
-        "name": name,
-        "email": email.group() if email else "Email Not Found",
-        "phone": phone.group() if phone else "Contact Not Found"
-    }
+    # Name, email and phone in one scan of the resume text
+    return ParseContact(text)
 
 def ExcellencyExtractor(text):
+    parsed = ParseAnalysis(text)
+    return parsed["experience"], parsed["education"], parsed["strengths"], parsed["weaknesses"]
 
-    excellency_pattern = r"Experience:\s*(.*?)\n\nEducation:\s*(.*?)(?=\n|$)"
-    strengths_pattern = r"Strengths:\s*(?:- )?([\s\S]*?)(?=\nWeaknesses:|\n$)"
-    weaknesses_pattern = r"Weaknesses:\s*(?:- )?([\s\S]*?)$"
-
-    match = re.search(excellency_pattern, text, re.DOTALL)
-    if match:
-        years_of_experience = match.group(1)
-        education = match.group(2).strip()
-    else:
-        years_of_experience = "0"
-        education = "No education found"
-
-    strengths_match = re.search(strengths_pattern, text, re.DOTALL)
-    strengths = [s.strip() for s in strengths_match.group(1).strip().split("\n- ")] if strengths_match else []
-
-    weaknesses_match = re.search(weaknesses_pattern, text, re.DOTALL)
-    weaknesses = [w.strip() for w in weaknesses_match.group(1).strip().split("\n- ")] if weaknesses_match else []
-
-    return years_of_experience, education, strengths, weaknesses
-
-
-def GenAITextExtractor(text, technology):
-    if technology == "Gemini":
-        prompt = f"""Act as a efficient ATS system. Summarize the text into data suitable for input to a RoBERTa model and in following format
+GEMINI_MODEL = "gemini-1.5-flash"
+GEMINI_GENERATION_CONFIG = {
+    "candidate_count": 1,
+    "max_output_tokens": 512,
+    "temperature": 0.5,
+}
+# Editing the template changes every cache key, so stale responses are never served
+GEMINI_PROMPT_TEMPLATE = """Act as a efficient ATS system. Summarize the text into data suitable for input to a RoBERTa model and in following format
 Skills: List skills here (Technical and Soft-skills), \n
 Experience: Provide the total years of experience, followed by the most relevant title based on the text. Include only one title, ensuring it aligns with the primary expertise area.
 Education: Summarize academic qualifications by listing the highest degree achieved. For candidates with dual degrees, mention only the highest. Replace abbreviations with full degree names (e.g., Bachelors, Masters). Do not include the field of study.
@@ -101,20 +89,177 @@ Guidelines:
 Ensure output is concise, adhering to the specified format.
 Avoid repetition, and focus on relevant details only.
 Do not include unnecessary commentary or additional formatting.Text: {text}"""
-        genai.configure(api_key=st.secrets.gemini.api_key)
-        # Selecting a gemini model depending on the plan (Free in this instance)
-        model = genai.GenerativeModel("gemini-1.5-flash")
-        response = model.generate_content(
-            prompt,
-            generation_config=genai.types.GenerationConfig(
-                candidate_count = 1,
-                max_output_tokens = 512,
-                temperature = 0.5
-            )
+
+# Batched extraction: several resumes per request, one JSON object per candidate
+GEMINI_BATCH_TOKEN_BUDGET = int(os.getenv("GEMINI_BATCH_TOKEN_BUDGET", "24000"))
+GEMINI_BATCH_MAX_DOCUMENTS = int(os.getenv("GEMINI_BATCH_MAX_DOCUMENTS", "8"))
+GEMINI_BATCH_RETRIES = int(os.getenv("GEMINI_BATCH_RETRIES", "2"))
+GEMINI_BATCH_RESPONSE_SCHEMA = {
+    "type": "array",
+    "items": {
+        "type": "object",
+        "properties": {
+            "id": {"type": "integer"},
+            "skills": {"type": "array", "items": {"type": "string"}},
+            "experience_years": {"type": "number"},
+            "title": {"type": "string"},
+            "education": {"type": "string"},
+            "strengths": {"type": "array", "items": {"type": "string"}},
+            "weaknesses": {"type": "array", "items": {"type": "string"}},
+        },
+        "required": ["id", "skills", "experience_years", "title", "education", "strengths"],
+    },
+}
+GEMINI_BATCH_GENERATION_CONFIG = {
+    "candidate_count": 1,
+    "temperature": 0.5,
+    "response_mime_type": "application/json",
+}
+GEMINI_BATCH_PROMPT_TEMPLATE = """Act as a efficient ATS system. For every resume below, delimited by <resume id="..."> tags, return one JSON object with:
+id: the id of the resume tag.
+skills: skills listed in the resume (Technical and Soft-skills).
+experience_years: the total years of experience as a number.
+title: the most relevant title based on the text. Include only one title, ensuring it aligns with the primary expertise area.
+education: the highest degree achieved. For candidates with dual degrees, mention only the highest. Replace abbreviations with full degree names (e.g., Bachelors, Masters). Do not include the field of study.
+strengths: three key strengths derived from the candidate's skills, experience, and notable achievements, concise and impactful.
+weaknesses: gaps relevant to the candidate's primary expertise area.
+Return a JSON array with exactly one object per resume and nothing else.
+{documents}"""
+
+def AnalysisVersion(technology):
+    """
+    Fingerprint of everything a stored analysis depends on: the technology, both Gemini prompts, the model and
+    generation configs, and the embedding model and backend. Stored candidates are only reused under the same one.
+    """
+    return CacheKey(
+        technology,
+        GEMINI_PROMPT_TEMPLATE + GEMINI_BATCH_PROMPT_TEMPLATE,
+        GEMINI_MODEL,
+        {"single": GEMINI_GENERATION_CONFIG, "batch": GEMINI_BATCH_GENERATION_CONFIG, "embedding": [DEFAULT_EMBEDDING_MODEL, EMBEDDING_BACKEND]},
+    )
+
+def GetGeminiApiKey():
+    """Gemini API key from the GEMINI_API_KEY environment variable, falling back to Streamlit secrets."""
+    return os.getenv("GEMINI_API_KEY") or st.secrets.gemini.api_key
+
+def GenAITextExtractor(text, technology, use_cache=True):
+    if technology == "Gemini":
+        # Identical documents are answered from the on-disk cache instead of a new request
+        cache = GetResponseCache() if use_cache else None
+        if cache:
+            cache_key = CacheKey(text, GEMINI_PROMPT_TEMPLATE, GEMINI_MODEL, GEMINI_GENERATION_CONFIG)
+            cached_response = cache.get(cache_key)
+            if cached_response is not None:
+                RecordLLMUsage(0, 0, cached=True)
+                return cached_response
+
+        # Shared client: rate limited to the plan's quota (Free in this instance), retried on 429s and timeouts
+        response = GetGeminiClient(GEMINI_MODEL, GetGeminiApiKey()).generate(
+            GEMINI_PROMPT_TEMPLATE.format(text=text),
+            generation_config=genai.types.GenerationConfig(**GEMINI_GENERATION_CONFIG),
+            max_output_tokens=GEMINI_GENERATION_CONFIG["max_output_tokens"],
         )
-        print(response.text)
+        usage = getattr(response, "usage_metadata", None)
+        if usage is not None:
+            RecordLLMUsage(usage.prompt_token_count, usage.candidates_token_count)
+        if cache:
+            cache.set(cache_key, response.text)
         return response.text
 
+    elif technology == "Fake":
+        # Deterministic offline stand-in with configurable latency, used by the benchmarks
+        response_text = FakeGeminiResponse(text)
+        # Rough four characters per token, so the token metrics are populated offline too
+        RecordLLMUsage(len(GEMINI_PROMPT_TEMPLATE.format(text=text)) // 4, len(response_text) // 4)
+        return response_text
+
+def _batch_documents(documents):
+    return "\n".join(f'<resume id="{document_id}">\n{text}\n</resume>' for document_id, text in documents)
+
+def _pack_requests(documents, token_budget, max_documents):
+    # Greedy packing in input order; a resume larger than the budget gets a request of its own
+    requests, current, current_tokens = [], [], len(GEMINI_BATCH_PROMPT_TEMPLATE) // CHARACTERS_PER_TOKEN
+    for document_id, text in documents:
+        tokens = len(text) // CHARACTERS_PER_TOKEN
+        if current and (current_tokens + tokens > token_budget or len(current) >= max_documents):
+            requests.append(current)
+            current, current_tokens = [], len(GEMINI_BATCH_PROMPT_TEMPLATE) // CHARACTERS_PER_TOKEN
+        current.append((document_id, text))
+        current_tokens += tokens
+    return requests + [current] if current else requests
+
+def _batch_request(documents, technology):
+    """One batched request; returns the raw JSON reply."""
+    if technology == "Fake":
+        response_text = FakeGeminiBatchResponse(documents)
+        RecordLLMUsage(len(GEMINI_BATCH_PROMPT_TEMPLATE.format(documents=_batch_documents(documents))) // CHARACTERS_PER_TOKEN, len(response_text) // CHARACTERS_PER_TOKEN)
+        return response_text
+    max_output_tokens = GEMINI_GENERATION_CONFIG["max_output_tokens"] * len(documents)
+    response = GetGeminiClient(GEMINI_MODEL, GetGeminiApiKey()).generate(
+        GEMINI_BATCH_PROMPT_TEMPLATE.format(documents=_batch_documents(documents)),
+        generation_config=genai.types.GenerationConfig(
+            **GEMINI_BATCH_GENERATION_CONFIG,
+            response_schema=GEMINI_BATCH_RESPONSE_SCHEMA,
+            max_output_tokens=max_output_tokens,
+        ),
+        max_output_tokens=max_output_tokens,
+    )
+    usage = getattr(response, "usage_metadata", None)
+    if usage is not None:
+        RecordLLMUsage(usage.prompt_token_count, usage.candidates_token_count)
+    return response.text
+
+def GenAIBatchExtractor(texts, technology, use_cache=True, token_budget=GEMINI_BATCH_TOKEN_BUDGET,
+                        max_documents=GEMINI_BATCH_MAX_DOCUMENTS, retries=GEMINI_BATCH_RETRIES):
+    """
+    Analyses several resumes per request as JSON (see GEMINI_BATCH_RESPONSE_SCHEMA). Returns one validated
+    analysis dict per text, or the exception for a text that still failed after `retries` further attempts.
+    Only the candidates that were missing or invalid in a reply are sent again.
+    """
+    results = [None] * len(texts)
+    cache = GetResponseCache() if use_cache else None
+    cache_keys = [CacheKey(text, GEMINI_BATCH_PROMPT_TEMPLATE, GEMINI_MODEL, GEMINI_BATCH_GENERATION_CONFIG) for text in texts] if cache else None
+    pending = []
+    for index, text in enumerate(texts):
+        cached_response = cache.get(cache_keys[index]) if cache else None
+        if cached_response is not None:
+            RecordLLMUsage(0, 0, cached=True)
+            results[index] = json.loads(cached_response)
+        else:
+            pending.append(index)
+
+    for attempt in range(retries + 1):
+        failed = []
+        # The last attempt sends every remaining resume on its own
+        batch_size = 1 if attempt == retries and attempt else max_documents
+        for request in _pack_requests([(index, texts[index]) for index in pending], token_budget, batch_size):
+            try:
+                reply = json.loads(_batch_request(request, technology))
+                if not isinstance(reply, list):
+                    raise ValueError("Expected a JSON array of analyses")
+                records = {str(record.get("id")): record for record in reply if isinstance(record, dict)}
+            except Exception as e:
+                for index, _ in request:
+                    results[index] = e
+                failed += [index for index, _ in request]
+                continue
+            for index, _ in request:
+                try:
+                    if str(index) not in records:
+                        raise ValueError("Candidate missing from the response")
+                    record = ValidateAnalysisRecord({key: value for key, value in records[str(index)].items() if key != "id"})
+                except ValueError as e:
+                    results[index] = e
+                    failed.append(index)
+                    continue
+                results[index] = record
+                if cache:
+                    cache.set(cache_keys[index], json.dumps(record))
+        pending = failed
+        if not pending:
+            break
+    return results
+
 """ Text similarity functions """
 """
 def CalculateResumeSimilarity(resume_text, job_description_text):
@@ -132,21 +277,9 @@ def CalculateResumeSimilarity(resume_text, job_description_text):
 """
 
 def CalculateResumeSimilarity(resume_text, job_description_text):
-    model_name = "sentence-transformers/all-MiniLM-L6-v2"
-    tokenizer = AutoTokenizer.from_pretrained(model_name)
-    model = AutoModel.from_pretrained(model_name)
-
-    def get_embeddings(text):
-        inputs = tokenizer(text, return_tensors="pt", padding=True, truncation=True)
-        outputs = model(**inputs)
-        
-        return outputs.last_hidden_state.mean(dim=1)
-    
-    resume_embeddings = get_embeddings(resume_text)
-    job_description_embeddings = get_embeddings(job_description_text)
-
-    similarity = cosine_similarity(resume_embeddings.detach().numpy(), job_description_embeddings.detach().numpy())
-    return similarity[0][0]
+    # Both texts go through the model in a single padded batch
+    embeddings = EmbedTextsShared([resume_text, job_description_text])
+    return float(ScoreEmbeddings(embeddings[:1], embeddings[1])[0])
 
 # --- Fit Categorization ---
 def CategorizeFit(similarity_score):
@@ -168,11 +301,16 @@ def CommunicationGenerator(message, fit_category):
 
 # --- Resource Monitoring ---
 def GetResourceUsage():
-    """Retrieves resource usage information."""
+    """Retrieves resource usage information: process RSS (MB), per-model load time/memory, Gemini request and embedding server stats."""
     process = psutil.Process()
     memory_info = process.memory_info()
     memory_consumed = memory_info.rss / (1024 ** 2)
-    return memory_consumed
+    return {
+        "memory_consumed": memory_consumed,
+        "models": GetModelStats(),
+        "gemini": GetGeminiStats(),
+        "embedding_server": GetEmbeddingServerStats(),
+    }
 
 def DatatableToDataframe(data):
     return pd.DataFrame([
@@ -181,6 +319,40 @@ def DatatableToDataframe(data):
             "Status": "✅" if applicant["status"]=="Success" else "❗",
             "Name": applicant["name"],
             "Similarity score": applicant["similarity_score"],
+            "Duplicate of": applicant.get("duplicate_of") or "",
         }
         for applicant in data
     ]).set_index("Name")
+
+def SearchResultsToDataframe(results):
+    """Candidate search results as (record, BM25 score) pairs, best first."""
+    return pd.DataFrame([
+        {
+            "Name": record["name"],
+            "Filename": record["filename"],
+            "Experience": record["experience"],
+            "Education": record["education"],
+            "Skills": record["resume_skills"],
+            "Score": round(score, 2) if score is not None else None,
+        }
+        for record, score in results
+    ])
+
+STAGE_COLUMNS = ("pdf_extraction", "fingerprint", "llm", "parsing", "embedding", "store")
+
+def StageTimingsToDataframe(data):
+    """Per-resume stage breakdown: wall time per stage, total CPU time, RSS delta and LLM tokens."""
+    rows = []
+    for applicant in data:
+        timings = applicant.get("timings") or {}
+        row = {"Filename": applicant["filename"]}
+        for stage in STAGE_COLUMNS:
+            row[f"{stage} (ms)"] = round(timings[stage]["wall"] * 1000, 1) if stage in timings else None
+        stages = [metrics for stage, metrics in timings.items() if stage != "llm_tokens"]
+        row["CPU (ms)"] = round(sum(metrics.get("cpu", 0.0) for metrics in stages) * 1000, 1)
+        row["RSS delta (MB)"] = round(sum(metrics.get("rss_delta", 0.0) for metrics in stages), 1)
+        tokens = timings.get("llm_tokens", {})
+        row["Prompt tokens"] = tokens.get("prompt")
+        row["Response tokens"] = tokens.get("response")
+        rows.append(row)
+    return pd.DataFrame(rows).set_index("Filename")
@@ -0,0 +1,144 @@
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from .embeddings import EmbedTexts, DEFAULT_EMBEDDING_MODEL
+from .metrics import RegisterCollector
+
+# Requests from every session are coalesced until this many texts are queued or the first has waited max wait seconds
+INFERENCE_MAX_BATCH_SIZE = int(os.getenv("INFERENCE_MAX_BATCH_SIZE", "64"))
+INFERENCE_MAX_WAIT = float(os.getenv("INFERENCE_MAX_WAIT", "0.002"))
+# 0 embeds on the calling thread, as before
+INFERENCE_SERVER = os.getenv("INFERENCE_SERVER", "1") != "0"
+
+QUEUE_DEPTH_BUCKETS = (0, 1, 2, 4, 8, 16, 32, 64, 128)
+BATCH_SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256)
+
+class _Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.count = 0
+        self.sum = 0
+
+    def observe(self, value):
+        self.count += 1
+        self.sum += value
+        for index, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[index] += 1
+
+    def render(self, name):
+        lines = [f'{name}_bucket{{le="{bound}"}} {count}' for bound, count in zip(self.buckets, self.counts)]
+        return lines + [f'{name}_bucket{{le="+Inf"}} {self.count}', f"{name}_sum {self.sum}", f"{name}_count {self.count}"]
+
+    def snapshot(self):
+        return {"buckets": dict(zip(self.buckets, self.counts)), "count": self.count, "sum": self.sum}
+
+class EmbeddingServer:
+    """
+    In-process inference service for the embedding model. Callers on any thread queue texts and get a
+    future; a single worker thread coalesces queued requests into micro-batches (bounded by max_batch_size
+    texts and max_wait seconds) so concurrent sessions share forward passes instead of competing for the CPU.
+    """
+
+    def __init__(self, max_batch_size=INFERENCE_MAX_BATCH_SIZE, max_wait=INFERENCE_MAX_WAIT):
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._queue_depth = _Histogram(QUEUE_DEPTH_BUCKETS)
+        self._batch_size = _Histogram(BATCH_SIZE_BUCKETS)
+        self._worker = threading.Thread(target=self._serve, name="embedding-server", daemon=True)
+        self._worker.start()
+
+    def submit(self, texts, model_name=DEFAULT_EMBEDDING_MODEL, **options):
+        """Queues texts for embedding; the future resolves to their EmbedTexts matrix."""
+        future = Future()
+        self._queue.put((list(texts), (model_name, tuple(sorted(options.items()))), future))
+        return future
+
+    def embed(self, texts, model_name=DEFAULT_EMBEDDING_MODEL, **options):
+        return self.submit(texts, model_name, **options).result()
+
+    def _collect(self):
+        requests = [self._queue.get()]
+        with self._lock:
+            self._queue_depth.observe(self._queue.qsize() + 1)
+        size = len(requests[0][0])
+        deadline = time.monotonic() + self.max_wait
+        while size < self.max_batch_size:
+            # A lone request runs at once; with concurrent load the batch waits up to max_wait to fill up
+            remaining = deadline - time.monotonic() if len(requests) > 1 else 0
+            try:
+                request = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            requests.append(request)
+            size += len(request[0])
+        # Futures cancelled while queued are dropped
+        return [request for request in requests if request[2].set_running_or_notify_cancel()]
+
+    def _serve(self):
+        while True:
+            groups = {}
+            for request in self._collect():
+                groups.setdefault(request[1], []).append(request)
+            # Requests for the same model and options share one EmbedTexts call
+            for (model_name, options), group in groups.items():
+                texts = [text for request_texts, _, _ in group for text in request_texts]
+                with self._lock:
+                    self._batch_size.observe(len(texts))
+                try:
+                    embeddings = EmbedTexts(texts, model_name, **dict(options))
+                except Exception as e:
+                    for _, _, future in group:
+                        future.set_exception(e)
+                    continue
+                offset = 0
+                for request_texts, _, future in group:
+                    future.set_result(embeddings[offset:offset + len(request_texts)])
+                    offset += len(request_texts)
+
+    def stats(self):
+        """Current queue depth and histograms of queue depth (per micro-batch) and texts per forward batch."""
+        with self._lock:
+            return {
+                "queue_depth": self._queue.qsize(),
+                "queue_depth_histogram": self._queue_depth.snapshot(),
+                "batch_size_histogram": self._batch_size.snapshot(),
+            }
+
+    def render_prometheus(self):
+        with self._lock:
+            return (
+                ["# HELP ats_embedding_queue_depth Embedding requests queued when a micro-batch starts.", "# TYPE ats_embedding_queue_depth histogram"]
+                + self._queue_depth.render("ats_embedding_queue_depth")
+                + ["# HELP ats_embedding_batch_size Texts per coalesced embedding batch.", "# TYPE ats_embedding_batch_size histogram"]
+                + self._batch_size.render("ats_embedding_batch_size")
+                + ["# HELP ats_embedding_queue_length Embedding requests currently queued.", "# TYPE ats_embedding_queue_length gauge",
+                   f"ats_embedding_queue_length {self._queue.qsize()}"]
+            )
+
+_embedding_server = None
+_embedding_server_lock = threading.Lock()
+
+def GetEmbeddingServer():
+    """Process-wide embedding server, started on first use."""
+    global _embedding_server
+    with _embedding_server_lock:
+        if _embedding_server is None:
+            _embedding_server = EmbeddingServer()
+            RegisterCollector(_embedding_server.render_prometheus)
+        return _embedding_server
+
+def EmbedTextsShared(texts, model_name=DEFAULT_EMBEDDING_MODEL, **options):
+    """EmbedTexts through the shared embedding server, or on this thread when INFERENCE_SERVER is 0."""
+    if not INFERENCE_SERVER:
+        return EmbedTexts(texts, model_name, **options)
+    return GetEmbeddingServer().embed(texts, model_name, **options)
+
+def GetEmbeddingServerStats():
+    """Stats of the embedding server, or None before it has started."""
+    return _embedding_server.stats() if _embedding_server is not None else None
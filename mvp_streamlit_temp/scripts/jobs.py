@@ -0,0 +1,198 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from .dedup import GetDuplicateIndex
+from .pipeline import FailedResult, StreamPipeline
+from .search import GetSearchIndex
+from .session import GetSessionStorage
+from .store import GetCandidateStore
+
+# Job database location, concurrent jobs and how long finished jobs are kept
+JOBS_DB_PATH = os.getenv("JOBS_DB_PATH", "./.cache/jobs.sqlite3")
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "2"))
+JOB_MAX_AGE = float(os.getenv("JOB_MAX_AGE", str(7 * 24 * 3600)))
+# Seconds between progress refreshes of a running job in the UI
+JOB_POLL_INTERVAL = float(os.getenv("JOB_POLL_INTERVAL", "1.0"))
+# Seconds a job may wait for memory to free up before it fails
+JOB_ADMISSION_TIMEOUT = float(os.getenv("JOB_ADMISSION_TIMEOUT", "600"))
+
+class JobRunner:
+    """
+    Runs analysis batches on background threads, independent of Streamlit script runs. Jobs, their inputs and
+    every per-resume result are checkpointed in SQLite, so a page refresh can reattach to a job and a job
+    interrupted by a restart resumes without redoing the resumes that already succeeded.
+    """
+
+    def __init__(self, path=JOBS_DB_PATH, workers=JOB_WORKERS, max_age=JOB_MAX_AGE):
+        self.path = path
+        self.max_age = max_age
+        self._lock = threading.Lock()
+        self._active = set()
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._connection = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.executescript(
+            """CREATE TABLE IF NOT EXISTS jobs (
+                job_id TEXT PRIMARY KEY,
+                status TEXT NOT NULL,
+                technology TEXT NOT NULL,
+                job_description TEXT NOT NULL,
+                total INTEGER NOT NULL,
+                error TEXT,
+                created REAL NOT NULL,
+                updated REAL NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS job_inputs (
+                job_id TEXT NOT NULL,
+                position INTEGER NOT NULL,
+                filename TEXT NOT NULL,
+                data BLOB NOT NULL,
+                PRIMARY KEY (job_id, position)
+            );
+            CREATE TABLE IF NOT EXISTS job_results (
+                job_id TEXT NOT NULL,
+                position INTEGER NOT NULL,
+                succeeded INTEGER NOT NULL,
+                result TEXT NOT NULL,
+                PRIMARY KEY (job_id, position)
+            );"""
+        )
+        self._connection.commit()
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="analysis-job")
+        self._purge()
+        # Jobs left queued or running by a previous process pick up where they stopped
+        for (job_id,) in self._execute("SELECT job_id FROM jobs WHERE status IN ('queued', 'running')"):
+            self.resume(job_id)
+
+    def _execute(self, statement, parameters=()):
+        with self._lock:
+            rows = self._connection.execute(statement, parameters).fetchall()
+            self._connection.commit()
+            return rows
+
+    def submit(self, resumes, job_description_text, technology):
+        """Queues (filename, bytes) resumes for analysis against a job description and returns the job id."""
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        with self._lock:
+            self._connection.execute(
+                "INSERT INTO jobs (job_id, status, technology, job_description, total, created, updated) VALUES (?, 'queued', ?, ?, ?, ?, ?)",
+                (job_id, technology, job_description_text, len(resumes), now, now),
+            )
+            self._connection.executemany(
+                "INSERT INTO job_inputs (job_id, position, filename, data) VALUES (?, ?, ?, ?)",
+                [(job_id, position, filename, data) for position, (filename, data) in enumerate(resumes)],
+            )
+            self._connection.commit()
+        self.resume(job_id)
+        return job_id
+
+    def resume(self, job_id):
+        """(Re)starts a queued, interrupted or failed job. Resumes that already succeeded are skipped."""
+        with self._lock:
+            if job_id in self._active:
+                return
+            self._active.add(job_id)
+        self._execute("UPDATE jobs SET status = 'queued', error = NULL, updated = ? WHERE job_id = ?", (time.time(), job_id))
+        self._executor.submit(self._run, job_id)
+
+    def _run(self, job_id):
+        try:
+            technology, job_description_text = self._execute("SELECT technology, job_description FROM jobs WHERE job_id = ?", (job_id,))[0]
+            # Admission control: the job stays queued while the process is short of memory, up to a deadline
+            deadline = time.monotonic() + JOB_ADMISSION_TIMEOUT
+            while not GetSessionStorage().admit():
+                if time.monotonic() >= deadline:
+                    raise RuntimeError(
+                        f"Server memory stayed above the admission limit for {JOB_ADMISSION_TIMEOUT:.0f} seconds. "
+                        "Retry later, or raise GLOBAL_MEMORY_BUDGET_MB."
+                    )
+                time.sleep(JOB_POLL_INTERVAL)
+            self._execute("UPDATE jobs SET status = 'running', updated = ? WHERE job_id = ?", (time.time(), job_id))
+            # Failed resumes are retried, successful ones are checkpointed and skipped
+            self._execute("DELETE FROM job_results WHERE job_id = ? AND succeeded = 0", (job_id,))
+            pending = self._execute(
+                """SELECT position, filename FROM job_inputs WHERE job_id = ? AND position NOT IN
+                   (SELECT position FROM job_results WHERE job_id = ?) ORDER BY position""",
+                (job_id, job_id),
+            )
+
+            def read_resumes():
+                # Contents are read lazily, so only the pipeline's in-flight window is held in memory
+                for position, filename in pending:
+                    (data,) = self._execute("SELECT data FROM job_inputs WHERE job_id = ? AND position = ?", (job_id, position))[0]
+                    yield filename, data
+
+            for index, result, error in StreamPipeline(read_resumes(), job_description_text, technology, store=GetCandidateStore(), duplicates=GetDuplicateIndex()):
+                position, filename = pending[index]
+                result = result if error is None else FailedResult(filename, error)
+                self._execute(
+                    "INSERT OR REPLACE INTO job_results (job_id, position, succeeded, result) VALUES (?, ?, ?, ?)",
+                    (job_id, position, int(error is None), json.dumps(result)),
+                )
+            self._execute("UPDATE jobs SET status = 'completed', updated = ? WHERE job_id = ?", (time.time(), job_id))
+            # The new candidates become searchable without waiting for the next query to index them
+            GetSearchIndex().sync()
+            # Inputs are only needed to resume an unfinished job
+            self._execute("DELETE FROM job_inputs WHERE job_id = ?", (job_id,))
+        except Exception as e:
+            self._execute("UPDATE jobs SET status = 'failed', error = ?, updated = ? WHERE job_id = ?", (str(e), time.time(), job_id))
+        finally:
+            with self._lock:
+                self._active.discard(job_id)
+
+    def status(self, job_id):
+        """Status of a job (queued, running, completed or failed) with its progress, or None for an unknown job."""
+        rows = self._execute(
+            """SELECT status, total, error, created, updated,
+                      (SELECT COUNT(*) FROM job_results WHERE job_results.job_id = jobs.job_id),
+                      (SELECT COUNT(*) FROM job_results WHERE job_results.job_id = jobs.job_id AND succeeded = 0)
+               FROM jobs WHERE job_id = ?""",
+            (job_id,),
+        )
+        if not rows:
+            return None
+        status, total, error, created, updated, completed, failed = rows[0]
+        return {
+            "job_id": job_id,
+            "status": status,
+            "total": total,
+            "completed": completed,
+            "failed": failed,
+            "error": error,
+            "created": created,
+            "updated": updated,
+        }
+
+    def job_description(self, job_id):
+        """Job description text a job was submitted with, or None for an unknown job."""
+        rows = self._execute("SELECT job_description FROM jobs WHERE job_id = ?", (job_id,))
+        return rows[0][0] if rows else None
+
+    def results(self, job_id):
+        """Checkpointed results of a job in the order they completed."""
+        return [json.loads(result) for (result,) in self._execute("SELECT result FROM job_results WHERE job_id = ? ORDER BY rowid", (job_id,))]
+
+    def _purge(self):
+        cutoff = time.time() - self.max_age
+        with self._lock:
+            for table in ("job_inputs", "job_results"):
+                self._connection.execute(f"DELETE FROM {table} WHERE job_id IN (SELECT job_id FROM jobs WHERE updated < ?)", (cutoff,))
+            self._connection.execute("DELETE FROM jobs WHERE updated < ?", (cutoff,))
+            self._connection.commit()
+
+_job_runner = None
+_job_runner_lock = threading.Lock()
+
+def GetJobRunner():
+    """Process-wide job runner, shared by every Streamlit session."""
+    global _job_runner
+    with _job_runner_lock:
+        if _job_runner is None:
+            _job_runner = JobRunner()
+        return _job_runner
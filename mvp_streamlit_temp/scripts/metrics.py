@@ -0,0 +1,162 @@
+import json
+import os
+import psutil
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Per-resume stage timings are appended here as JSON lines; the Prometheus text file is rewritten on every update
+METRICS_DIR = os.getenv("METRICS_DIR", "./.cache/metrics")
+METRICS_JSONL_PATH = os.path.join(METRICS_DIR, "stages.jsonl")
+METRICS_PROMETHEUS_PATH = os.path.join(METRICS_DIR, "metrics.prom")
+# The log is rotated to stages.jsonl.1 ... .N once it passes the size limit; the oldest file is dropped
+METRICS_JSONL_MAX_MB = float(os.getenv("METRICS_JSONL_MAX_MB", "50"))
+METRICS_JSONL_BACKUPS = int(os.getenv("METRICS_JSONL_BACKUPS", "3"))
+METRICS_PORT = int(os.getenv("METRICS_PORT", "0"))
+
+HISTOGRAM_BUCKETS = (0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+""" Spans """
+# Timings dict of the span running on this thread, so LLM token usage lands on the right resume
+_active = threading.local()
+
+def _rss_mb():
+    return psutil.Process().memory_info().rss / (1024 ** 2)
+
+class Span:
+    """
+    Records wall time, thread CPU time and RSS delta of a stage into timings[stage].
+    RSS is process wide, so with concurrent resumes the delta is indicative only.
+    """
+
+    def __init__(self, stage, timings):
+        self.stage = stage
+        self.timings = timings
+
+    def __enter__(self):
+        self._previous = getattr(_active, "timings", None)
+        _active.timings = self.timings
+        self._rss = _rss_mb()
+        self._cpu = time.thread_time()
+        self._wall = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.timings[self.stage] = {
+            "wall": time.perf_counter() - self._wall,
+            "cpu": time.thread_time() - self._cpu,
+            "rss_delta": _rss_mb() - self._rss,
+        }
+        _active.timings = self._previous
+        return False
+
+def RecordLLMUsage(prompt_tokens, response_tokens, cached=False):
+    """Adds LLM token counts to the resume whose span is running on this thread."""
+    timings = getattr(_active, "timings", None)
+    if timings is None:
+        return
+    usage = timings.setdefault("llm_tokens", {"prompt": 0, "response": 0, "cached": False})
+    usage["prompt"] += prompt_tokens or 0
+    usage["response"] += response_tokens or 0
+    usage["cached"] = usage["cached"] or cached
+
+""" Export """
+_lock = threading.Lock()
+_stage_histograms = {}
+_llm_tokens = {"prompt": 0, "response": 0}
+_resumes_total = {"Success": 0, "Failed": 0}
+_collectors = []
+
+def RegisterCollector(collector):
+    """Adds a callable returning extra Prometheus text lines to every export."""
+    with _lock:
+        _collectors.append(collector)
+
+def _rotate_log(path, max_bytes=METRICS_JSONL_MAX_MB * 1024 ** 2, backups=METRICS_JSONL_BACKUPS):
+    if not os.path.exists(path) or os.path.getsize(path) < max_bytes:
+        return
+    if backups <= 0:
+        os.remove(path)
+        return
+    for index in range(backups - 1, 0, -1):
+        if os.path.exists(f"{path}.{index}"):
+            os.replace(f"{path}.{index}", f"{path}.{index + 1}")
+    os.replace(path, f"{path}.1")
+
+def RecordResume(filename, candidate_id, timings, status="Success"):
+    """Appends one resume's stage timings to the JSON lines log and updates the Prometheus metrics."""
+    with _lock:
+        _resumes_total[status] = _resumes_total.get(status, 0) + 1
+        for stage, metrics in timings.items():
+            if stage == "llm_tokens":
+                _llm_tokens["prompt"] += metrics["prompt"]
+                _llm_tokens["response"] += metrics["response"]
+                continue
+            histogram = _stage_histograms.setdefault(stage, {"count": 0, "sum": 0.0, "cpu": 0.0, "buckets": [0] * len(HISTOGRAM_BUCKETS)})
+            histogram["count"] += 1
+            histogram["sum"] += metrics["wall"]
+            histogram["cpu"] += metrics.get("cpu", 0.0)
+            for index, bound in enumerate(HISTOGRAM_BUCKETS):
+                if metrics["wall"] <= bound:
+                    histogram["buckets"][index] += 1
+
+        os.makedirs(METRICS_DIR, exist_ok=True)
+        _rotate_log(METRICS_JSONL_PATH)
+        with open(METRICS_JSONL_PATH, "a", encoding="utf-8") as f:
+            f.write(json.dumps({"timestamp": time.time(), "filename": filename, "candidate_id": candidate_id, "status": status, "timings": timings}) + "\n")
+        text = _render_prometheus()
+        with open(METRICS_PROMETHEUS_PATH + ".tmp", "w") as f:
+            f.write(text)
+        os.replace(METRICS_PROMETHEUS_PATH + ".tmp", METRICS_PROMETHEUS_PATH)
+
+def _render_prometheus():
+    lines = [
+        "# HELP ats_stage_seconds Wall time per resume of each analysis stage.",
+        "# TYPE ats_stage_seconds histogram",
+    ]
+    for stage, histogram in sorted(_stage_histograms.items()):
+        for bound, count in zip(HISTOGRAM_BUCKETS, histogram["buckets"]):
+            lines.append(f'ats_stage_seconds_bucket{{stage="{stage}",le="{bound}"}} {count}')
+        lines.append(f'ats_stage_seconds_bucket{{stage="{stage}",le="+Inf"}} {histogram["count"]}')
+        lines.append(f'ats_stage_seconds_sum{{stage="{stage}"}} {histogram["sum"]:.6f}')
+        lines.append(f'ats_stage_seconds_count{{stage="{stage}"}} {histogram["count"]}')
+    lines += ["# HELP ats_stage_cpu_seconds_total CPU time spent in each analysis stage.", "# TYPE ats_stage_cpu_seconds_total counter"]
+    lines += [f'ats_stage_cpu_seconds_total{{stage="{stage}"}} {histogram["cpu"]:.6f}' for stage, histogram in sorted(_stage_histograms.items())]
+    lines += ["# HELP ats_llm_tokens_total LLM tokens used by resume analysis.", "# TYPE ats_llm_tokens_total counter"]
+    lines += [f'ats_llm_tokens_total{{kind="{kind}"}} {count}' for kind, count in _llm_tokens.items()]
+    lines += ["# HELP ats_resumes_total Analysed resumes by status.", "# TYPE ats_resumes_total counter"]
+    lines += [f'ats_resumes_total{{status="{status}"}} {count}' for status, count in _resumes_total.items()]
+    lines += ["# HELP ats_process_resident_memory_megabytes Resident memory of the app process.", "# TYPE ats_process_resident_memory_megabytes gauge"]
+    lines.append(f"ats_process_resident_memory_megabytes {_rss_mb():.1f}")
+    for collector in _collectors:
+        lines += collector()
+    return "\n".join(lines) + "\n"
+
+def RenderPrometheus():
+    """Current metrics in the Prometheus text exposition format."""
+    with _lock:
+        return _render_prometheus()
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        body = RenderPrometheus().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+_metrics_server = None
+
+def StartMetricsServer(port=METRICS_PORT):
+    """Serves /metrics on the given port from a daemon thread, once per process. Port 0 disables it."""
+    global _metrics_server
+    with _lock:
+        if not port or _metrics_server is not None:
+            return _metrics_server
+        _metrics_server = ThreadingHTTPServer(("0.0.0.0", port), _MetricsHandler)
+        threading.Thread(target=_metrics_server.serve_forever, name="metrics-server", daemon=True).start()
+        return _metrics_server
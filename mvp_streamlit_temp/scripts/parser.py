@@ -0,0 +1,136 @@
+import re
+
+""" Precompiled patterns """
+# Section headings of the analysis prompt's output, tolerating markdown decoration such as "**Skills:**" or "- Skills:"
+SECTION_HEADER_PATTERN = re.compile(r"^[\s*#-]*(skills|experience|education|strengths|weaknesses)[\s*]*:[\s*]*(.*)$", re.IGNORECASE)
+# Skills are separated by commas, semicolons, colons, line breaks or a sentence-ending period (node.js stays one skill)
+SKILL_SEPARATOR_PATTERN = re.compile(r"[,;:\n]|\.(?=\s|$)")
+BULLET_PATTERN = re.compile(r"^\s*(?:[-•*]|\d+[.)])\s*")
+LINE_BULLET_PATTERN = re.compile(r"^[ \t]*(?:[-•]|\d+[.)])[ \t]*", re.MULTILINE)
+INLINE_WHITESPACE_PATTERN = re.compile(r"[ \t\r\f\v]+")
+# Email and phone in one alternation so the resume is scanned once for both
+CONTACT_PATTERN = re.compile(r"(?P<email>[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,})|(?P<phone>\+?\d[\d -]{8,12}\d)")
+
+SECTION_NAMES = ("skills", "experience", "education", "strengths", "weaknesses")
+
+def SplitSections(text):
+    """Splits an analysis response into {section: [lines]} in a single pass over its lines."""
+    sections = {}
+    current_section = None
+    for line in text.splitlines():
+        header = SECTION_HEADER_PATTERN.match(line)
+        if header:
+            current_section = header.group(1).lower()
+            sections.setdefault(current_section, [])
+            line = header.group(2)
+        if current_section is not None and line.strip():
+            sections[current_section].append(line.strip())
+    return sections
+
+def ParseSkills(text, sections=None):
+    """Lower-cased, de-duplicated skills of an analysis response. Falls back to the whole response when it has no Skills section."""
+    sections = SplitSections(text) if sections is None else sections
+    skills_text = "\n".join(sections["skills"]) if sections.get("skills") else text
+    # Clean the whole text once so each skill only needs a strip
+    skills_text = LINE_BULLET_PATTERN.sub("", skills_text.lower().replace("*", ""))
+    skills_text = INLINE_WHITESPACE_PATTERN.sub(" ", skills_text)
+    skills = {}
+    for skill in SKILL_SEPARATOR_PATTERN.split(skills_text):
+        skill = skill.strip()
+        if skill and skill not in SECTION_NAMES:
+            skills[skill] = None
+    return list(skills)
+
+def ParseContact(resume_text):
+    """Name (first line), email and phone of a resume."""
+    email = phone = None
+    for match in CONTACT_PATTERN.finditer(resume_text):
+        if match.lastgroup == "email" and email is None:
+            email = match.group()
+        elif match.lastgroup == "phone" and phone is None:
+            phone = match.group()
+        if email and phone:
+            break
+
+    # Extract Name (assuming first line of the resume might be the name)
+    name = resume_text.splitlines()[0].strip() if resume_text else "Name Not Found"
+    return {
+        "name": name,
+        "email": email or "Email Not Found",
+        "phone": phone or "Contact Not Found",
+    }
+
+def _list_items(lines):
+    items = []
+    for line in lines:
+        item = BULLET_PATTERN.sub("", line).strip()
+        if item:
+            items.append(item)
+    return items
+
+def ParseAnalysis(response_text, resume_text=""):
+    """
+    Parses the LLM analysis of a resume (and the raw resume for contact details) into
+    skills, experience, education, strengths, weaknesses, name, email and phone.
+    """
+    sections = SplitSections(response_text)
+    experience = sections.get("experience")
+    education = sections.get("education")
+
+    parsed = ParseContact(resume_text)
+    parsed.update({
+        "skills": ParseSkills(response_text, sections),
+        "experience": " ".join(experience) if experience else "0",
+        "education": education[0] if education else "No education found",
+        "strengths": _list_items(sections.get("strengths", [])),
+        "weaknesses": _list_items(sections.get("weaknesses", [])),
+    })
+    return parsed
+
+""" Structured (JSON) analyses """
+ANALYSIS_FIELDS = {
+    "skills": list,
+    "experience_years": (int, float),
+    "title": str,
+    "education": str,
+    "strengths": list,
+}
+
+def ValidateAnalysisRecord(record):
+    """Checks one candidate of a JSON analysis against the schema and returns it with defaults filled in. Raises ValueError."""
+    if not isinstance(record, dict):
+        raise ValueError(f"Expected an object, got {type(record).__name__}")
+    for field, expected_type in ANALYSIS_FIELDS.items():
+        if not isinstance(record.get(field), expected_type) or isinstance(record.get(field), bool):
+            raise ValueError(f"Field '{field}' is missing or has the wrong type")
+    if not all(isinstance(item, str) for item in record["skills"] + record["strengths"] + record.get("weaknesses", [])):
+        raise ValueError("List fields must only contain strings")
+    return {**record, "weaknesses": record.get("weaknesses", [])}
+
+def FormatAnalysis(record):
+    """Renders a validated JSON analysis in the free text format of the analysis prompt, as stored and embedded."""
+    return (
+        f"Skills: {', '.join(record['skills'])}\n\n"
+        f"Experience: {record['experience_years']:g} years, {record['title']}\n\n"
+        f"Education: {record['education']}\n"
+        "Strengths:\n" + "\n".join(f"- {strength}" for strength in record["strengths"]) + "\n"
+        "Weaknesses:\n" + "\n".join(f"- {weakness}" for weakness in record["weaknesses"])
+    )
+
+def ParseStructuredAnalysis(record, resume_text=""):
+    """Same output as ParseAnalysis, read from a validated JSON analysis instead of scraping text."""
+    skills = {}
+    for skill in record["skills"]:
+        skill = INLINE_WHITESPACE_PATTERN.sub(" ", skill.lower().replace("*", "")).strip()
+        if skill:
+            skills[skill] = None
+
+    parsed = ParseContact(resume_text)
+    parsed.update({
+        "skills": list(skills),
+        "experience": f"{record['experience_years']:g} years, {record['title']}",
+        "education": record["education"] or "No education found",
+        "strengths": [strength.strip() for strength in record["strengths"] if strength.strip()],
+        "weaknesses": [weakness.strip() for weakness in record["weaknesses"] if weakness.strip()],
+    })
+    return parsed
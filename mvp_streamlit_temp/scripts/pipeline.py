@@ -0,0 +1,422 @@
+import hashlib
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from io import BytesIO
+from .cache import NormaliseText
+from .embeddings import ScoreEmbeddings
+from .inference import EmbedTextsShared
+from .helpers import ReadFromPDF, AnalysisVersion, GenAITextExtractor, GenAIBatchExtractor, CategorizeFit, CommunicationGenerator, GEMINI_BATCH_MAX_DOCUMENTS, GEMINI_BATCH_TOKEN_BUDGET, CHARACTERS_PER_TOKEN
+from .lazy import LazyModule
+from .metrics import Span, RecordResume
+from .parser import FormatAnalysis, ParseAnalysis, ParseSkills, ParseStructuredAnalysis
+from .pools import SubmitToProcessPool
+from .skills import MatchSkills
+
+np = LazyModule("numpy")
+
+# Defaults for the staged batch pipeline
+PDF_WORKERS = min(4, os.cpu_count() or 1)
+LLM_WORKERS = 8
+EMBEDDING_BATCH_SIZE = 16
+QUEUE_SIZE = 32
+# Several resumes per Gemini request (GenAIBatchExtractor); a batch is sent when full or after BATCH_MAX_WAIT seconds
+BATCH_PROMPTING = os.getenv("GEMINI_BATCH_PROMPTING", "0") == "1"
+BATCH_MAX_WAIT = float(os.getenv("GEMINI_BATCH_MAX_WAIT", "0.5"))
+
+"""
+Analyzes extracted resume text against the analysed job description. Similarity is filled in by ScoreResult.
+Stage spans are recorded into timings, which is attached to the result.
+A JSON analysis from GenAIBatchExtractor can be passed in, the LLM call is skipped then.
+"""
+def AnalyseText(filename, resume_text, analysed_job_description, technology, timings=None, analysis=None):
+    timings = {} if timings is None else timings
+
+    """TASK: PROMPT ENGINEERING"""
+    if analysis is None:
+        with Span("llm", timings):
+            analysed_resume = GenAITextExtractor(resume_text, technology)
+
+    """TASK: PERSONAL INFORMATION, SKILLS, EXPERIENCE, EDUCATION, STRENGTHS, WEAKNESSES"""
+    with Span("parsing", timings):
+        if analysis is None:
+            # One pass over the LLM response and one over the resume text
+            parsed = ParseAnalysis(analysed_resume, resume_text)
+        else:
+            analysed_resume = FormatAnalysis(analysis)
+            parsed = ParseStructuredAnalysis(analysis, resume_text)
+
+        """TASK: JOB DESCRIPTION MATCHING"""
+        # Identify matching skills
+        resume_skill_set = parsed["skills"]
+        job_description_skill_set = ParseSkills(analysed_job_description)
+        matching_skills, missing_skills = MatchSkills(resume_skill_set, job_description_skill_set)
+
+    return {
+        "candidate_id": CandidateId(resume_text),
+        "filename": filename,
+        "status": "Success",
+        "name": parsed["name"],
+        "email": parsed["email"],
+        "phone": parsed["phone"],
+        "similarity_score": None,
+        "matching_skills": ", ".join(skill for skill in matching_skills if skill.strip()),
+        "experience": parsed["experience"],
+        "education": parsed["education"],
+        "strengths": ", ".join(parsed["strengths"]),
+        "missing_skills": ", ".join(missing_skills),
+        "tool_response": None,
+        "analysed_resume": analysed_resume,
+        "resume_skills": ", ".join(resume_skill_set),
+        "job_skills": ", ".join(job_description_skill_set),
+        "timings": timings,
+    }
+
+def CandidateId(resume_text):
+    """Content hash of the extracted resume text, stable across re-uploads and file names."""
+    return hashlib.sha256(NormaliseText(resume_text).encode("utf-8")).hexdigest()
+
+def RematchSkills(result, job_description_skill_set):
+    """Redoes the skill comparison of a stored result against another job description."""
+    matching_skills, missing_skills = MatchSkills(result["resume_skills"].split(", "), job_description_skill_set)
+    result["matching_skills"] = ", ".join(skill for skill in matching_skills if skill.strip())
+    result["missing_skills"] = ", ".join(missing_skills)
+    result["job_skills"] = ", ".join(job_description_skill_set)
+    return result
+
+def DuplicateResult(original, filename, timings):
+    """Copy of an analysed result for a duplicate upload, flagged with the file it duplicates."""
+    return {**original, "filename": filename, "duplicate_of": original["filename"], "timings": timings}
+
+def FailedResult(filename, error):
+    """Row for a resume that could not be analysed, shown as "❗" in the comparison table."""
+    return {
+        "candidate_id": None,
+        "filename": filename,
+        "status": f"Failed: {error}",
+        "name": filename,
+        "email": "Email Not Found",
+        "phone": "Contact Not Found",
+        "similarity_score": None,
+        "matching_skills": "",
+        "experience": "",
+        "education": "",
+        "strengths": "",
+        "missing_skills": "",
+        "tool_response": None,
+        "analysed_resume": "",
+        "resume_skills": "",
+        "job_skills": "",
+        "timings": {},
+    }
+
+"""Fills in the similarity score, fit category and communication response of an analysed resume."""
+def ScoreResult(result, similarity_score):
+    fit_category, fit_percentage = CategorizeFit(float(similarity_score))
+    result["similarity_score"] = f"{similarity_score*100:.2f}%"
+    # Generate communication response
+    result["tool_response"] = CommunicationGenerator(
+        f"The candidate has the following skills: {result['resume_skills']}.",
+        fit_category
+    )
+    return result
+
+def ExtractText(filename, data):
+    """
+    Extracts text from raw .pdf/.txt file contents and returns (text, timings) with the extraction span.
+    Module level so it can run in a worker process.
+    """
+    timings = {}
+    with Span("pdf_extraction", timings):
+        if os.path.splitext(filename)[1] == '.pdf':
+            text = ReadFromPDF(BytesIO(data))
+        else:
+            text = data.decode("utf-8")
+    return text, timings
+
+def _completed_future(value):
+    future = Future()
+    future.set_result(value)
+    return future
+
+""" Batch pipeline """
+def StreamPipeline(resumes, job_description_text, technology, store=None,
+                   pdf_workers=PDF_WORKERS, llm_workers=LLM_WORKERS,
+                   embedding_batch_size=EMBEDDING_BATCH_SIZE, queue_size=QUEUE_SIZE, max_in_flight=None,
+                   batch_prompting=BATCH_PROMPTING, duplicates=None):
+    """
+    Analyses (filename, bytes) resumes against a job description in three overlapping stages:
+    page-budgeted PDF extraction in a process pool, concurrent LLM calls in a thread pool and a batching
+    embedding stage on its own thread. Yields (index, result, error) in completion order; error
+    is the exception that stopped that resume, result is None then.
+    resumes may be a lazy iterable, at most max_in_flight of them are read and held in memory at once.
+    When a CandidateStore is given, every analysed resume is appended to it together with its embedding, and
+    files it already holds (same bytes, same AnalysisVersion) skip extraction, analysis and embedding; only their
+    skill match and similarity are recomputed against this job description.
+    With batch_prompting, extracted resumes are collected and analysed several per LLM request.
+    Uploads identical to an earlier one in the batch reuse its result without extraction. With a DuplicateIndex
+    as duplicates, extracted texts are also fingerprinted, and near-duplicates of a resume in this batch or in
+    the store reuse its analysis. Both kinds are flagged with duplicate_of.
+    Failures that affect the whole batch (job description, embedding stage) are raised.
+    """
+    max_in_flight = max_in_flight or (llm_workers + queue_size)
+    analysis_version = AnalysisVersion(technology)
+    embedding_queue = queue.Queue(maxsize=queue_size)
+    prompt_queue = queue.Queue()
+    completed_queue = queue.Queue()
+    stop = threading.Event()
+    # Originals of this batch still in flight (file hash -> index and waiting duplicates) and the ones analysed
+    duplicates_lock = threading.Lock()
+    originals, analysed = {}, {}
+
+    def embed_stage(analysed_job_description_future):
+        try:
+            job_description_embedding = EmbedTextsShared([analysed_job_description_future.result()])[0]
+            while not stop.is_set():
+                item = embedding_queue.get()
+                if item is None:
+                    return
+                # Take whatever else is already waiting to fill the forward pass
+                batch = [item]
+                while len(batch) < embedding_batch_size:
+                    try:
+                        item = embedding_queue.get_nowait()
+                    except queue.Empty:
+                        break
+                    if item is None:
+                        stop.set()
+                        break
+                    batch.append(item)
+
+                # Reused candidates come with their stored embedding
+                new = [position for position, (_, _, embedding) in enumerate(batch) if embedding is None]
+                batch_timings = {}
+                if new:
+                    with Span("embedding", batch_timings):
+                        new_embeddings = EmbedTextsShared([batch[position][1]["analysed_resume"] for position in new])
+                    if store is not None:
+                        with Span("store", batch_timings):
+                            store.add([batch[position][1] for position in new], new_embeddings)
+                    for position, embedding in zip(new, new_embeddings):
+                        index, result, _ = batch[position]
+                        batch[position] = (index, result, embedding)
+                        # Batched stages are shared out evenly between the resumes embedded in the batch
+                        for stage, metrics in batch_timings.items():
+                            result["timings"][stage] = {**{key: value / len(new) for key, value in metrics.items()}, "batch_size": len(new)}
+                embeddings = np.stack([embedding for _, _, embedding in batch])
+                for (index, result, _), similarity_score in zip(batch, ScoreEmbeddings(embeddings, job_description_embedding)):
+                    completed_queue.put((index, ScoreResult(result, similarity_score), None))
+        except Exception as e:
+            completed_queue.put((None, None, e))
+
+    def llm_stage(index, filename, file_hash, stored, text_future, analysed_job_description_future):
+        if stop.is_set():
+            return
+        try:
+            analysed_job_description = analysed_job_description_future.result()
+        except Exception as e:
+            completed_queue.put((None, None, e))
+            return
+        try:
+            if stored is not None:
+                record, embedding = stored
+                result = {**record, "filename": filename, "timings": {}}
+                RematchSkills(result, ParseSkills(analysed_job_description))
+            else:
+                resume_text, timings = text_future.result()
+                if duplicates is not None:
+                    with Span("fingerprint", timings):
+                        match = duplicates.match_or_add(file_hash, resume_text)
+                    if match is not None and match[0] != file_hash:
+                        if follow(index, filename, match[0], timings):
+                            return
+                        near_duplicate = store.find_file(match[0], analysis_version) if store is not None else None
+                        if near_duplicate is not None:
+                            record, embedding = near_duplicate
+                            result = RematchSkills(DuplicateResult(record, filename, timings), ParseSkills(analysed_job_description))
+                            hand_off(index, result, embedding)
+                            return
+                if batch_prompting:
+                    # Analysed together with other resumes by prompt_batch_stage
+                    prompt_queue.put((index, filename, file_hash, resume_text, timings, analysed_job_description))
+                    return
+                result = AnalyseText(filename, resume_text, analysed_job_description, technology, timings)
+                result["file_hash"], result["technology"], result["analysis_version"], embedding = file_hash, technology, analysis_version, None
+        except Exception as e:
+            completed_queue.put((index, None, e))
+            return
+        hand_off(index, result, embedding)
+
+    def follow(index, filename, original_hash, timings):
+        # Answers a duplicate from its original in this batch; False when the original is not part of it or failed
+        with duplicates_lock:
+            if original_hash in originals:
+                originals[original_hash]["followers"].append((index, filename, timings))
+                return True
+            original = analysed.get(original_hash)
+        if original is None:
+            return False
+        completed_queue.put((index, DuplicateResult(original, filename, timings), None))
+        return True
+
+    def hand_off(index, result, embedding):
+        # Bounded hand-off: wait for the embedding stage unless the batch was aborted
+        while not stop.is_set():
+            try:
+                embedding_queue.put((index, result, embedding), timeout=0.1)
+                return
+            except queue.Full:
+                continue
+
+    def prompt_batch_stage():
+        # Collects extracted resumes until a request is full or BATCH_MAX_WAIT passes, then sends it on the LLM pool
+        while not stop.is_set():
+            item = prompt_queue.get()
+            if item is None:
+                return
+            batch, tokens = [item], len(item[3]) // CHARACTERS_PER_TOKEN
+            deadline = time.monotonic() + BATCH_MAX_WAIT
+            while len(batch) < GEMINI_BATCH_MAX_DOCUMENTS and tokens < GEMINI_BATCH_TOKEN_BUDGET:
+                try:
+                    item = prompt_queue.get(timeout=max(0.0, deadline - time.monotonic()))
+                except queue.Empty:
+                    break
+                if item is None:
+                    stop.set()
+                    break
+                batch.append(item)
+                tokens += len(item[3]) // CHARACTERS_PER_TOKEN
+            llm_pool.submit(analyse_prompt_batch, batch)
+
+    def analyse_prompt_batch(batch):
+        batch_timings = {}
+        try:
+            with Span("llm", batch_timings):
+                analyses = GenAIBatchExtractor([resume_text for _, _, _, resume_text, _, _ in batch], technology)
+        except Exception as e:
+            analyses = [e] * len(batch)
+        for (index, filename, file_hash, resume_text, timings, analysed_job_description), analysis in zip(batch, analyses):
+            if stop.is_set():
+                return
+            # The request is shared out evenly between the resumes in it
+            for stage, metrics in batch_timings.items():
+                timings[stage] = {key: value / len(batch) if isinstance(value, (int, float)) and not isinstance(value, bool) else value for key, value in metrics.items()}
+            timings.get("llm", {})["batch_size"] = len(batch)
+            try:
+                if isinstance(analysis, Exception):
+                    raise analysis
+                result = AnalyseText(filename, resume_text, analysed_job_description, technology, timings, analysis)
+                result["file_hash"], result["technology"], result["analysis_version"] = file_hash, technology, analysis_version
+            except Exception as e:
+                completed_queue.put((index, None, e))
+                continue
+            hand_off(index, result, None)
+
+    with ThreadPoolExecutor(max_workers=llm_workers) as llm_pool:
+        # Job description goes first so resumes waiting on it are not delayed further
+        analysed_job_description_future = llm_pool.submit(GenAITextExtractor, job_description_text, technology)
+        embedding_thread = threading.Thread(target=embed_stage, args=(analysed_job_description_future,), name="embedding-stage", daemon=True)
+        embedding_thread.start()
+        if batch_prompting:
+            prompt_thread = threading.Thread(target=prompt_batch_stage, name="prompt-batching", daemon=True)
+            prompt_thread.start()
+
+        llm_futures, filenames, file_hashes = {}, {}, {}
+        def submit(index, filename, data):
+            filenames[index] = filename
+            file_hash = hashlib.sha256(data).hexdigest()
+            file_hashes[index] = file_hash
+            if follow(index, filename, file_hash, {}):
+                # Same bytes as an earlier upload in this batch
+                llm_futures[index] = _completed_future(None)
+                return
+            with duplicates_lock:
+                originals[file_hash] = {"index": index, "followers": []}
+            stored = store.find_file(file_hash, analysis_version) if store is not None else None
+            try:
+                if stored is not None:
+                    text_future = None
+                elif os.path.splitext(filename)[1] == '.pdf':
+                    # Long-lived pool shared by every batch of the process
+                    text_future = SubmitToProcessPool("pdf", pdf_workers, ExtractText, filename, data)
+                else:
+                    text_future = _completed_future(ExtractText(filename, data))
+            except Exception as e:
+                text_future = Future()
+                text_future.set_exception(e)
+            llm_futures[index] = llm_pool.submit(llm_stage, index, filename, file_hash, stored, text_future, analysed_job_description_future)
+
+        pending = enumerate(resumes)
+        try:
+            # Keep a bounded window of resumes in flight, topping it up as they complete
+            for index, (filename, data) in pending:
+                submit(index, filename, data)
+                if len(llm_futures) >= max_in_flight:
+                    break
+            while llm_futures:
+                index, result, error = completed_queue.get()
+                if index is None:
+                    raise error
+                del llm_futures[index]
+                file_hash = file_hashes.pop(index)
+                with duplicates_lock:
+                    is_original = originals.get(file_hash, {}).get("index") == index
+                    followers = originals.pop(file_hash)["followers"] if is_original else []
+                    if is_original and result is not None:
+                        analysed[file_hash] = result
+                for follower_index, follower_filename, follower_timings in followers:
+                    # Duplicates waiting on this resume complete with its result, or its error
+                    completed_queue.put((follower_index, DuplicateResult(result, follower_filename, follower_timings) if result is not None else None, error))
+                if result is not None:
+                    RecordResume(result["filename"], result["candidate_id"], result["timings"])
+                else:
+                    RecordResume(filenames[index], None, {}, status="Failed")
+                filenames.pop(index)
+                yield index, result, error
+                for index, (filename, data) in pending:
+                    submit(index, filename, data)
+                    break
+        finally:
+            stop.set()
+            for llm_future in llm_futures.values():
+                llm_future.cancel()
+            try:
+                embedding_queue.put_nowait(None)
+            except queue.Full:
+                # Queue is not drained any more once stop is set, the embedding thread exits on its own
+                pass
+            prompt_queue.put(None)
+            if batch_prompting:
+                prompt_thread.join()
+            embedding_thread.join()
+
+def RunPipeline(resumes, job_description_text, technology, on_progress=None, store=None, **pipeline_options):
+    """
+    Runs StreamPipeline over a list of resumes and returns the results in input order.
+    on_progress(completed, total, result) is always called on the calling thread, so it may touch Streamlit elements.
+    """
+    total = len(resumes)
+    results = [None] * total
+    for completed, (index, result, error) in enumerate(StreamPipeline(resumes, job_description_text, technology, store=store, **pipeline_options), start=1):
+        if error is not None:
+            raise error
+        results[index] = result
+        if on_progress:
+            on_progress(completed, total, result)
+    return results
+
+""" Candidate history """
+def RankStoredCandidates(job_description_text, technology, store, k=50):
+    """Ranks the k best previously analysed candidates in the store against a job description."""
+    # The analysed job description is normally a response cache hit
+    analysed_job_description = GenAITextExtractor(job_description_text, technology)
+    job_description_embedding = EmbedTextsShared([analysed_job_description])[0]
+    job_description_skill_set = ParseSkills(analysed_job_description)
+
+    results = []
+    for record, similarity_score in store.top_k(job_description_embedding, k):
+        result = RematchSkills(dict(record), job_description_skill_set)
+        results.append(ScoreResult(result, similarity_score))
+    return results
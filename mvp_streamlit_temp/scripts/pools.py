@@ -0,0 +1,30 @@
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+# Workers are started by a clean server process instead of being forked from the app, whose other threads
+# (torch, the embedding server, Streamlit) may hold locks at fork time
+PROCESS_START_METHOD = os.getenv("PROCESS_START_METHOD", "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn")
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+def GetProcessPool(name, workers):
+    """Process-wide pool per name and size, started on first use and kept for the life of the process."""
+    with _pools_lock:
+        if (name, workers) not in _pools:
+            _pools[(name, workers)] = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context(PROCESS_START_METHOD))
+        return _pools[(name, workers)]
+
+def SubmitToProcessPool(name, workers, function, *args):
+    """Submits to the named pool, replacing it once when a crashed worker has broken it."""
+    pool = GetProcessPool(name, workers)
+    try:
+        return pool.submit(function, *args)
+    except BrokenProcessPool:
+        with _pools_lock:
+            if _pools.get((name, workers)) is pool:
+                del _pools[(name, workers)]
+        return GetProcessPool(name, workers).submit(function, *args)
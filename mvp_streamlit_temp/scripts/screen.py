@@ -0,0 +1,94 @@
+"""
+Headless batch screening, independent of the Streamlit UI.
+
+    python -m scripts.screen --job-description job.txt resumes/ "archive/**/*.pdf" > results.jsonl
+
+The Gemini API key is read from the GEMINI_API_KEY environment variable.
+"""
+import argparse
+import glob
+import json
+import os
+import sys
+from .dedup import DuplicateIndex, DEDUP_DIR
+from .pipeline import StreamPipeline, BATCH_PROMPTING, LLM_WORKERS, PDF_WORKERS
+from .store import CandidateStore, STORE_DIR
+
+SUPPORTED_EXTENSIONS = ('.pdf', '.txt')
+
+# Internal fields that are not part of a screening record
+_EXCLUDED_FIELDS = ("analysed_resume",)
+
+def ExpandInputs(inputs):
+    """Yields resume file paths from a mix of files, directories and glob patterns, in a stable order."""
+    for entry in inputs:
+        if os.path.isdir(entry):
+            paths = sorted(
+                os.path.join(root, filename)
+                for root, _, filenames in os.walk(entry)
+                for filename in filenames
+            )
+        elif os.path.isfile(entry):
+            paths = [entry]
+        else:
+            paths = sorted(glob.glob(entry, recursive=True))
+        for path in paths:
+            if os.path.splitext(path)[1].lower() in SUPPORTED_EXTENSIONS:
+                yield path
+
+def _read_resumes(paths):
+    # Lazy, so only the pipeline's in-flight window of files is held in memory
+    for path in paths:
+        with open(path, "rb") as f:
+            yield os.path.basename(path), f.read()
+
+def screen(inputs, job_description_text, technology="Gemini", workers=LLM_WORKERS, pdf_workers=PDF_WORKERS, store=None, batch_prompting=BATCH_PROMPTING, duplicates=None):
+    """
+    Screens resumes (files, directories or glob patterns) against a job description.
+    Yields one record per candidate as soon as it is scored; failed resumes yield a record with status "Failed".
+    """
+    paths = list(ExpandInputs(inputs))
+    for index, result, error in StreamPipeline(_read_resumes(paths), job_description_text, technology, store=store,
+                                               pdf_workers=pdf_workers, llm_workers=workers, batch_prompting=batch_prompting,
+                                               duplicates=duplicates):
+        if error is not None:
+            yield {"path": paths[index], "status": "Failed", "error": str(error)}
+            continue
+        record = {"path": paths[index]}
+        record.update((key, value) for key, value in result.items() if key not in _EXCLUDED_FIELDS)
+        yield record
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Screen resumes against a job description and write one JSON line per candidate.")
+    parser.add_argument("inputs", nargs="+", help="Resume files (.pdf/.txt), directories or glob patterns")
+    parser.add_argument("-j", "--job-description", required=True, help="Job description text file")
+    parser.add_argument("-o", "--output", default="-", help="Output JSONL file (default: stdout)")
+    parser.add_argument("-t", "--technology", default="Gemini", choices=["Gemini", "Fake"], help="LLM used for the analysis (Fake runs offline)")
+    parser.add_argument("-w", "--workers", type=int, default=LLM_WORKERS, help="Concurrent LLM requests")
+    parser.add_argument("--pdf-workers", type=int, default=PDF_WORKERS, help="Processes used for PDF extraction")
+    parser.add_argument("--batch-prompting", action="store_true", default=BATCH_PROMPTING, help="Analyse several resumes per LLM request as JSON")
+    parser.add_argument("--store", default=STORE_DIR, help="Candidate store directory")
+    parser.add_argument("--no-store", action="store_true", help="Do not add screened candidates to the candidate store")
+    parser.add_argument("--dedup", default=DEDUP_DIR, help="Near-duplicate fingerprint directory")
+    parser.add_argument("--no-dedup", action="store_true", help="Analyse near-duplicate resumes instead of reusing the original's analysis")
+    args = parser.parse_args(argv)
+
+    with open(args.job_description, "r", encoding="utf-8") as f:
+        job_description_text = f.read()
+    store = None if args.no_store else CandidateStore(args.store)
+    duplicates = None if args.no_dedup else DuplicateIndex(args.dedup)
+
+    output = sys.stdout if args.output == "-" else open(args.output, "w", encoding="utf-8")
+    failed = 0
+    try:
+        for record in screen(args.inputs, job_description_text, technology=args.technology, workers=args.workers, pdf_workers=args.pdf_workers, store=store, batch_prompting=args.batch_prompting, duplicates=duplicates):
+            failed += record["status"] == "Failed"
+            output.write(json.dumps(record) + "\n")
+            output.flush()
+    finally:
+        if output is not sys.stdout:
+            output.close()
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,146 @@
+import math
+import re
+import threading
+from array import array
+from .lazy import LazyModule
+from .store import GetCandidateStore
+
+np = LazyModule("numpy")
+
+# BM25 parameters: term frequency saturation and document length normalisation
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+# Keeps "c++", "c#" and "node.js" whole
+TOKEN_PATTERN = re.compile(r"[a-z0-9][a-z0-9+#.]*")
+STOPWORDS = frozenset((
+    "a", "an", "and", "are", "as", "at", "be", "by", "for", "from", "in", "is", "it", "of", "on", "or",
+    "the", "to", "with", "years", "year", "skills", "experience", "education", "strengths", "weaknesses",
+))
+# Ordinal of the highest degree, for "at least" filters
+EDUCATION_LEVELS = ("Any", "Associate", "Bachelors", "Masters", "Doctorate")
+EDUCATION_PATTERNS = (
+    (4, re.compile(r"doctor|ph\.?d", re.IGNORECASE)),
+    (3, re.compile(r"master|m\.?sc|mba", re.IGNORECASE)),
+    (2, re.compile(r"bachelor|b\.?sc|b\.?tech|undergraduate", re.IGNORECASE)),
+    (1, re.compile(r"associate|diploma", re.IGNORECASE)),
+)
+YEARS_PATTERN = re.compile(r"\d+(?:\.\d+)?")
+
+def Tokenize(text):
+    tokens = (token.rstrip(".") for token in TOKEN_PATTERN.findall(text.lower()))
+    return [token for token in tokens if token not in STOPWORDS]
+
+def EducationLevel(education):
+    """Ordinal of the highest degree mentioned (see EDUCATION_LEVELS), 0 when none is recognised."""
+    return next((level for level, pattern in EDUCATION_PATTERNS if pattern.search(education or "")), 0)
+
+def ExperienceYears(experience):
+    """Years of experience from an "experience" field ("5 years, Data Scientist"), 0 when absent."""
+    years = YEARS_PATTERN.search(experience or "")
+    return float(years.group()) if years else 0.0
+
+class SearchIndex:
+    """
+    In-memory inverted index with BM25 ranking over the analysed resume text and skills of every stored
+    candidate, with experience and education as columns for filtering. The candidate store is append-only,
+    so sync() only indexes the rows added since the previous call.
+    """
+
+    def __init__(self, store):
+        self.store = store
+        self._lock = threading.Lock()
+        self._records = []
+        # term -> (document ids, term frequencies), ids ascending as documents are only appended
+        self._postings = {}
+        self._lengths = array("f")
+        self._experience = array("f")
+        self._education = array("b")
+        self._total_length = 0
+
+    def __len__(self):
+        return len(self._records)
+
+    def sync(self):
+        """Indexes candidates added to the store since the last sync. Returns how many were added."""
+        with self._lock:
+            new_records = self.store.records(start=len(self._records))
+            for record in new_records:
+                document = len(self._records)
+                tokens = Tokenize(f"{record.get('analysed_resume', '')} {record.get('resume_skills', '')} {record.get('name', '')}")
+                frequencies = {}
+                for token in tokens:
+                    frequencies[token] = frequencies.get(token, 0) + 1
+                for token, frequency in frequencies.items():
+                    documents, counts = self._postings.setdefault(token, (array("I"), array("H")))
+                    documents.append(document)
+                    counts.append(min(frequency, 65535))
+                self._records.append(record)
+                self._lengths.append(len(tokens))
+                self._total_length += len(tokens)
+                self._experience.append(ExperienceYears(record.get("experience")))
+                self._education.append(EducationLevel(record.get("education")))
+            return len(new_records)
+
+    def search(self, query="", min_experience=0.0, max_experience=None, min_education=0, require_all=True, k=50):
+        """
+        Returns up to k (record, score) pairs: candidates matching the query terms ranked by BM25, filtered by
+        years of experience and minimum education level (index into EDUCATION_LEVELS). With require_all every
+        term has to appear. An empty query returns filtered candidates, most recently analysed first.
+        """
+        self.sync()
+        with self._lock:
+            count = len(self._records)
+            if not count:
+                return []
+            records = self._records
+            # Copies, as a live buffer view would stop sync() from appending to the arrays
+            experience = np.array(self._experience, dtype=np.float32)
+            education = np.array(self._education, dtype=np.int8)
+            lengths = np.array(self._lengths, dtype=np.float32)
+            terms = list(dict.fromkeys(Tokenize(query)))
+            postings = [self._postings.get(term) for term in terms]
+            postings = [None if posting is None else (np.array(posting[0], dtype=np.int64), np.array(posting[1], dtype=np.float32)) for posting in postings]
+            average_length = self._total_length / count
+        superseded = [row for row in self.store.superseded() if row < count]
+
+        mask = (experience >= min_experience) & (education >= min_education)
+        # Earlier analyses of a candidate that was analysed again
+        mask[superseded] = False
+        if max_experience is not None:
+            mask &= experience <= max_experience
+        if terms:
+            if require_all and any(posting is None for posting in postings):
+                return []
+            scores = np.zeros(count, dtype=np.float32)
+            matches = np.zeros(count, dtype=np.int32)
+            for posting in postings:
+                if posting is None:
+                    continue
+                documents, frequencies = posting
+                idf = math.log(1 + (count - len(documents) + 0.5) / (len(documents) + 0.5))
+                normalisation = BM25_K1 * (1 - BM25_B + BM25_B * lengths[documents] / max(average_length, 1e-9))
+                scores[documents] += idf * frequencies * (BM25_K1 + 1) / (frequencies + normalisation)
+                matches[documents] += 1
+            mask &= (matches == len(terms)) if require_all else (matches > 0)
+        else:
+            scores = np.arange(count, dtype=np.float32)
+
+        candidates = np.flatnonzero(mask)
+        if not len(candidates):
+            return []
+        k = min(k, len(candidates))
+        top = candidates[np.argpartition(-scores[candidates], k - 1)[:k]]
+        top = top[np.argsort(-scores[top], kind="stable")]
+        return [(records[document], float(scores[document]) if terms else None) for document in top]
+
+_search_index = None
+_search_index_lock = threading.Lock()
+
+def GetSearchIndex():
+    """Process-wide search index over the candidate store, built on first use."""
+    global _search_index
+    with _search_index_lock:
+        if _search_index is None:
+            _search_index = SearchIndex(GetCandidateStore())
+        return _search_index
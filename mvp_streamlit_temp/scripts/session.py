@@ -0,0 +1,246 @@
+import atexit
+import collections
+import io
+import mmap
+import os
+import pickle
+import shutil
+import tempfile
+import threading
+import time
+import uuid
+from streamlit.runtime.scriptrunner import get_script_run_ctx
+from .helpers import GetResourceUsage
+
+# Spill files live in a per-process temp directory, removed at exit
+SESSION_SPILL_DIR = os.getenv("SESSION_SPILL_DIR", os.path.join(tempfile.gettempdir(), "cdf-sessions"))
+# Bytes a session may keep in memory before its least recently used values are spilled to disk
+SESSION_MEMORY_BUDGET_MB = float(os.getenv("SESSION_MEMORY_BUDGET_MB", "64"))
+# Process RSS above which every session is spilled, least recently active first
+GLOBAL_MEMORY_BUDGET_MB = float(os.getenv("GLOBAL_MEMORY_BUDGET_MB", "2048"))
+# New batches wait while RSS is above this share of the global budget
+SESSION_ADMISSION_THRESHOLD = float(os.getenv("SESSION_ADMISSION_THRESHOLD", "0.9"))
+# Sessions without a script run for this many seconds are dropped with their files
+SESSION_IDLE_TIMEOUT = float(os.getenv("SESSION_IDLE_TIMEOUT", "3600"))
+SESSION_ENFORCE_INTERVAL = float(os.getenv("SESSION_ENFORCE_INTERVAL", "5"))
+
+def _size(value):
+    if isinstance(value, (bytes, bytearray)):
+        return len(value)
+    if isinstance(value, io.BytesIO):
+        return value.getbuffer().nbytes
+    if hasattr(value, "memory_usage"):
+        # pandas DataFrame
+        return int(value.memory_usage(deep=True).sum())
+    return len(pickle.dumps(value, pickle.HIGHEST_PROTOCOL))
+
+class SpilledFile:
+    """
+    An uploaded file kept on disk, with the name/size/getvalue interface of Streamlit's UploadedFile.
+    getvalue returns a read-only view of a memory map, so the contents stay in the page cache rather than
+    being copied onto the heap.
+    """
+
+    def __init__(self, name, path, size):
+        self.name = name
+        self.path = path
+        self.size = size
+        self._mapped = None
+
+    def getvalue(self):
+        if not self.size:
+            return memoryview(b"")
+        if self._mapped is None:
+            with open(self.path, "rb") as f:
+                self._mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        return memoryview(self._mapped)
+
+    def discard(self):
+        """Removes the file; it may already be gone with an evicted session."""
+        if self._mapped is not None:
+            try:
+                self._mapped.close()
+            except BufferError:
+                # A view is still in use; the mapping is released with it
+                pass
+            self._mapped = None
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
+
+class _Session:
+    def __init__(self, directory):
+        self.directory = directory
+        self.last_seen = time.monotonic()
+        # key -> (value, size), least recently used first
+        self.resident = collections.OrderedDict()
+        # key -> (path, size, is_bytes); raw bytes are read back as bytes, anything else unpickled
+        self.spilled = {}
+
+    def resident_bytes(self):
+        return sum(size for _, size in self.resident.values())
+
+class SessionStorage:
+    """
+    Large per-session values (results, generated documents) and uploads, held in memory up to a per-session
+    budget and spilled to temp files beyond it. Idle sessions are evicted, and when process RSS passes the
+    global budget every session is spilled, least recently active first.
+    """
+
+    def __init__(self, directory=SESSION_SPILL_DIR, session_budget_mb=SESSION_MEMORY_BUDGET_MB,
+                 global_budget_mb=GLOBAL_MEMORY_BUDGET_MB, idle_timeout=SESSION_IDLE_TIMEOUT):
+        self.directory = os.path.join(directory, str(os.getpid()))
+        self.session_budget = session_budget_mb * 1024 ** 2
+        self.global_budget_mb = global_budget_mb
+        self.idle_timeout = idle_timeout
+        self._sessions = {}
+        self._lock = threading.Lock()
+        self._last_enforced = 0.0
+        os.makedirs(self.directory, exist_ok=True)
+        atexit.register(shutil.rmtree, self.directory, ignore_errors=True)
+
+    def _session(self, session_id):
+        session = self._sessions.get(session_id)
+        if session is None:
+            session = self._sessions[session_id] = _Session(os.path.join(self.directory, uuid.uuid4().hex))
+            os.makedirs(session.directory, exist_ok=True)
+        session.last_seen = time.monotonic()
+        return session
+
+    def _drop(self, session, key):
+        session.resident.pop(key, None)
+        path, _, _ = session.spilled.pop(key, (None, 0, False))
+        if path:
+            os.remove(path)
+
+    def _spill(self, session, key):
+        value, size = session.resident.pop(key)
+        path = os.path.join(session.directory, uuid.uuid4().hex)
+        is_bytes = isinstance(value, (bytes, bytearray))
+        with open(path, "wb") as f:
+            if is_bytes:
+                f.write(value)
+            else:
+                pickle.dump(value, f, pickle.HIGHEST_PROTOCOL)
+        session.spilled[key] = (path, os.path.getsize(path), is_bytes)
+
+    def put(self, session_id, key, value):
+        """Stores a value for a session; None removes it."""
+        with self._lock:
+            session = self._session(session_id)
+            self._drop(session, key)
+            if value is None:
+                return
+            session.resident[key] = (value, _size(value))
+            # Spill least recently used values (possibly this one) until the session fits its budget
+            while session.resident and session.resident_bytes() > self.session_budget:
+                self._spill(session, next(iter(session.resident)))
+
+    def get(self, session_id, key, default=None):
+        """
+        A stored value, read back from disk when it was spilled. The spilled copy stays on disk, so the value
+        read is only held in memory while the caller uses it.
+        """
+        with self._lock:
+            session = self._session(session_id)
+            if key in session.resident:
+                session.resident.move_to_end(key)
+                return session.resident[key][0]
+            if key not in session.spilled:
+                return default
+            path, _, is_bytes = session.spilled[key]
+            # Read under the lock, so clear() cannot remove the file halfway
+            with open(path, "rb") as f:
+                return f.read() if is_bytes else pickle.load(f)
+
+    def spill_file(self, session_id, name, data):
+        """Writes an upload to the session's spill directory and returns a SpilledFile for it."""
+        with self._lock:
+            # Written under the lock, so clear() cannot remove the session directory halfway
+            session = self._session(session_id)
+            path = os.path.join(session.directory, uuid.uuid4().hex)
+            with open(path, "wb") as f:
+                f.write(data)
+        return SpilledFile(name, path, len(data))
+
+    def clear(self, session_id):
+        """Drops every value and file of a session."""
+        with self._lock:
+            session = self._sessions.pop(session_id, None)
+        if session is not None:
+            shutil.rmtree(session.directory, ignore_errors=True)
+
+    def touch(self, session_id):
+        """Marks a session active, enforcing the budgets at most every SESSION_ENFORCE_INTERVAL seconds."""
+        with self._lock:
+            self._session(session_id)
+        self.enforce()
+
+    def enforce(self, force=False):
+        """Evicts idle sessions and spills sessions while RSS is over the global budget. Rate limited unless forced."""
+        now = time.monotonic()
+        if not force and now - self._last_enforced < SESSION_ENFORCE_INTERVAL:
+            return
+        self._last_enforced = now
+        with self._lock:
+            idle = [session_id for session_id, session in self._sessions.items() if now - session.last_seen > self.idle_timeout]
+        for session_id in idle:
+            self.clear(session_id)
+
+        if GetResourceUsage()["memory_consumed"] <= self.global_budget_mb:
+            return
+        with self._lock:
+            sessions = sorted(self._sessions.values(), key=lambda session: session.last_seen)
+        for session in sessions:
+            with self._lock:
+                while session.resident:
+                    self._spill(session, next(iter(session.resident)))
+            if GetResourceUsage()["memory_consumed"] <= self.global_budget_mb:
+                return
+
+    def admit(self):
+        """Whether a new batch may start now: RSS, after enforcing the budget, is below the admission threshold."""
+        if GetResourceUsage()["memory_consumed"] < self.global_budget_mb * SESSION_ADMISSION_THRESHOLD:
+            return True
+        self.enforce(force=True)
+        return GetResourceUsage()["memory_consumed"] < self.global_budget_mb * SESSION_ADMISSION_THRESHOLD
+
+    def stats(self):
+        """Number of sessions with the bytes they hold in memory and on disk."""
+        with self._lock:
+            return {
+                "sessions": len(self._sessions),
+                "resident_bytes": sum(session.resident_bytes() for session in self._sessions.values()),
+                "spilled_bytes": sum(spilled[1] for session in self._sessions.values() for spilled in session.spilled.values()),
+            }
+
+_session_storage = None
+_session_storage_lock = threading.Lock()
+
+def GetSessionStorage():
+    """Process-wide session storage, shared by every Streamlit session."""
+    global _session_storage
+    with _session_storage_lock:
+        if _session_storage is None:
+            _session_storage = SessionStorage()
+        return _session_storage
+
+def SessionId():
+    ctx = get_script_run_ctx()
+    return ctx.session_id if ctx else "default"
+
+def TouchSession():
+    GetSessionStorage().touch(SessionId())
+
+def SessionValue(key, default=None):
+    """Value stored for the current Streamlit session."""
+    return GetSessionStorage().get(SessionId(), key, default)
+
+def SetSessionValue(key, value):
+    GetSessionStorage().put(SessionId(), key, value)
+
+def SpillUploads(uploaded_files):
+    """Moves Streamlit uploads to disk, so session state only keeps small handles."""
+    storage, session_id = GetSessionStorage(), SessionId()
+    return [storage.spill_file(session_id, uploaded_file.name, uploaded_file.getvalue()) for uploaded_file in uploaded_files]
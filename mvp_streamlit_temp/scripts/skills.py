@@ -0,0 +1,133 @@
+import json
+import os
+import threading
+from .embeddings import DEFAULT_EMBEDDING_MODEL, EMBEDDING_BACKEND
+from .inference import EmbedTextsShared
+from .lazy import LazyModule
+
+np = LazyModule("numpy")
+
+SKILL_INDEX_DIR = os.getenv("SKILL_INDEX_DIR", "./.cache/skills")
+# Cosine similarity above which two skill phrases count as the same skill ("pytorch" / "pytorch framework"); above 1 means exact matches only
+SKILL_MATCH_THRESHOLD = float(os.getenv("SKILL_MATCH_THRESHOLD", "0.75"))
+
+def _count_lines(path):
+    with open(path, "rb") as f:
+        return sum(1 for _ in f)
+
+class SkillIndex:
+    """
+    Embeddings of every skill phrase seen so far, each phrase embedded once. Phrases are appended to a
+    JSON lines file and their embeddings to a raw float32 matrix, so the index survives restarts.
+    """
+
+    def __init__(self, model_name=DEFAULT_EMBEDDING_MODEL, backend=EMBEDDING_BACKEND, directory=SKILL_INDEX_DIR):
+        self.model_name = model_name
+        self.backend = backend
+        self.directory = os.path.join(directory, f"{model_name.replace('/', '__')}.{backend}")
+        os.makedirs(self.directory, exist_ok=True)
+        self._phrases_path = os.path.join(self.directory, "phrases.jsonl")
+        self._embeddings_path = os.path.join(self.directory, "embeddings.f32")
+        self._meta_path = os.path.join(self.directory, "index.json")
+        self._lock = threading.Lock()
+        self._rows = {}
+        # Published rows are a view of _buffer, which has spare capacity so appends do not copy the whole matrix
+        self._buffer = None
+        self._matrix = None
+        if not os.path.exists(self._meta_path):
+            return
+
+        with open(self._meta_path, "r") as f:
+            dimension = json.load(f)["dimension"]
+        phrases = []
+        if os.path.exists(self._phrases_path):
+            with open(self._phrases_path, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        phrases.append(json.loads(line))
+                    except json.JSONDecodeError:
+                        # Half-written line from an interrupted append
+                        break
+        # Phrases and embeddings are written separately; keep only rows present in both
+        matrix = np.fromfile(self._embeddings_path, dtype=np.float32) if os.path.exists(self._embeddings_path) else np.zeros(0, dtype=np.float32)
+        rows = min(len(phrases), matrix.size // dimension)
+        if rows < len(phrases) or os.path.exists(self._phrases_path) and len(phrases) < _count_lines(self._phrases_path):
+            # Drop phrases whose embeddings never reached disk, and any torn line, so appends stay readable
+            with open(self._phrases_path, "w", encoding="utf-8") as f:
+                f.writelines(json.dumps(phrase) + "\n" for phrase in phrases[:rows])
+        if rows:
+            self._buffer = matrix[:rows * dimension].reshape(rows, dimension)
+            self._matrix = self._buffer
+            self._rows = {phrase: row for row, phrase in enumerate(phrases[:rows])}
+
+    def __len__(self):
+        return len(self._rows)
+
+    def embeddings(self, phrases):
+        """L2-normalised embeddings of the given phrases (one row each); unseen phrases are embedded in one pass and persisted."""
+        missing = list(dict.fromkeys(phrase for phrase in phrases if phrase not in self._rows))
+        if missing:
+            with self._lock:
+                missing = [phrase for phrase in missing if phrase not in self._rows]
+                if missing:
+                    self._append(missing, EmbedTextsShared(missing, self.model_name, chunking=False, backend=self.backend))
+        matrix = self._matrix
+        return matrix[[self._rows[phrase] for phrase in phrases]]
+
+    def _append(self, phrases, embeddings):
+        rows = 0 if self._matrix is None else self._matrix.shape[0]
+        if self._matrix is None:
+            with open(self._meta_path, "w") as f:
+                json.dump({"dimension": embeddings.shape[1]}, f)
+        # Truncate any partial tail left behind by a crash before appending
+        with open(self._embeddings_path, "ab") as f:
+            f.truncate(rows * 4 * embeddings.shape[1])
+            f.write(embeddings.astype(np.float32).tobytes())
+        with open(self._phrases_path, "a", encoding="utf-8") as f:
+            for phrase in phrases:
+                f.write(json.dumps(phrase) + "\n")
+        end = rows + len(phrases)
+        if self._buffer is None or end > self._buffer.shape[0]:
+            # Double the capacity; readers keep the previous buffer until they fetch the matrix again
+            buffer = np.empty((max(end, 2 * rows, 64), embeddings.shape[1]), dtype=np.float32)
+            if rows:
+                buffer[:rows] = self._matrix
+            self._buffer = buffer
+        # Rows past the published view are not visible to readers until the view is extended
+        self._buffer[rows:end] = embeddings
+        # Publish the grown matrix before the rows that point into it
+        self._matrix = self._buffer[:end]
+        for offset, phrase in enumerate(phrases):
+            self._rows[phrase] = rows + offset
+
+_skill_index = None
+_skill_index_lock = threading.Lock()
+
+def GetSkillIndex():
+    """Process-wide skill index, loaded on first use."""
+    global _skill_index
+    with _skill_index_lock:
+        if _skill_index is None:
+            _skill_index = SkillIndex()
+        return _skill_index
+
+def MatchSkills(resume_skill_set, job_description_skill_set, threshold=SKILL_MATCH_THRESHOLD, index=None):
+    """
+    Returns (matching_skills, missing_skills): the job description skills a resume has, exactly or by
+    embedding similarity above threshold, and the ones it does not. Exact matches never touch the model.
+    """
+    resume_skill_set = [skill for skill in resume_skill_set if skill.strip()]
+    job_description_skill_set = [skill for skill in job_description_skill_set if skill.strip()]
+    resume_skills = set(resume_skill_set)
+    matching_skills = [skill for skill in job_description_skill_set if skill in resume_skills]
+    remaining_skills = [skill for skill in job_description_skill_set if skill not in resume_skills]
+    if not remaining_skills or not resume_skill_set or threshold > 1:
+        return matching_skills, remaining_skills
+
+    # Every remaining job description skill against every resume skill in one matrix product
+    index = index if index is not None else GetSkillIndex()
+    similarity = index.embeddings(remaining_skills) @ index.embeddings(resume_skill_set).T
+    matched = similarity.max(axis=1) >= threshold
+    matching_skills += [skill for skill, is_match in zip(remaining_skills, matched) if is_match]
+    missing_skills = [skill for skill, is_match in zip(remaining_skills, matched) if not is_match]
+    return matching_skills, missing_skills
@@ -0,0 +1,214 @@
+import contextlib
+import json
+import os
+import threading
+try:
+    import fcntl
+except ImportError:
+    # No cross-process locking on Windows; a single writer process is assumed there
+    fcntl = None
+from .embeddings import DEFAULT_EMBEDDING_MODEL, EMBEDDING_BACKEND
+from .lazy import LazyModule
+
+np = LazyModule("numpy")
+
+STORE_DIR = os.getenv("CANDIDATE_STORE_DIR", "./.cache/candidates")
+
+@contextlib.contextmanager
+def FileLock(path, exclusive=True):
+    """Advisory lock on path shared between processes (e.g. the app and the screening CLI)."""
+    with open(path, "a") as lock_file:
+        if fcntl is not None:
+            fcntl.flock(lock_file, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+class CandidateStore:
+    """
+    Persistent store of every analysed candidate. Records (extracted fields and analysed resume text) are
+    appended to a JSON lines file and their embeddings to a raw float32 matrix that is memory-mapped for search.
+    store.json records the embedding model, backend and dimension; a store is only opened for the model it was
+    built with, as similarities across embedding spaces are meaningless. Several processes may share a store:
+    writes hold a file lock, and rows appended by other processes are picked up before writing and reading.
+    """
+
+    def __init__(self, directory=STORE_DIR, model_name=DEFAULT_EMBEDDING_MODEL, backend=EMBEDDING_BACKEND):
+        self.directory = directory
+        self.model_name = model_name
+        self.backend = backend
+        os.makedirs(directory, exist_ok=True)
+        self._records_path = os.path.join(directory, "candidates.jsonl")
+        self._embeddings_path = os.path.join(directory, "embeddings.f32")
+        self._meta_path = os.path.join(directory, "store.json")
+        self._lock_path = os.path.join(directory, "store.lock")
+        self._lock = threading.Lock()
+        self._matrix = None
+        self.dimension = None
+        self._records = []
+        # Bytes of candidates.jsonl read into _records
+        self._records_offset = 0
+        # Candidate to its latest row; earlier rows of a candidate re-analysed under a new AnalysisVersion are superseded
+        self._latest = {}
+        self._superseded = set()
+        # Raw upload hash to row, so an unchanged file can skip extraction, analysis and embedding
+        self._files = {}
+        with self._lock, FileLock(self._lock_path, exclusive=False):
+            self._refresh()
+
+    def _load_meta(self):
+        if self.dimension is not None or not os.path.exists(self._meta_path):
+            return
+        with open(self._meta_path, "r") as f:
+            meta = json.load(f)
+        # Stores written before the model was recorded are taken to hold the current one
+        if meta.get("model", self.model_name) != self.model_name:
+            raise ValueError(
+                f"Candidate store {self.directory} holds embeddings of {meta['model']}, not {self.model_name}. "
+                "Point CANDIDATE_STORE_DIR to another directory for this model."
+            )
+        self.dimension = meta["dimension"]
+
+    def _refresh(self):
+        # Reads rows appended since the last refresh, by this or another process. Needs the file lock
+        self._load_meta()
+        if not self.dimension or not os.path.exists(self._records_path) or os.path.getsize(self._records_path) == self._records_offset:
+            return
+        # Records and embeddings are written separately; keep only rows present in both
+        stored_rows = os.path.getsize(self._embeddings_path) // (4 * self.dimension) if os.path.exists(self._embeddings_path) else 0
+        with open(self._records_path, "rb") as f:
+            f.seek(self._records_offset)
+            lines = f.read().split(b"\n")[:-1]
+        for line in lines:
+            if len(self._records) >= stored_rows:
+                break
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                # Half-written line from an interrupted append
+                break
+            self._index(len(self._records), record)
+            self._records.append(record)
+            self._records_offset += len(line) + 1
+        self._matrix = None
+
+    def _sync(self):
+        # Cheap check for rows written by another process
+        if os.path.exists(self._records_path) and os.path.getsize(self._records_path) != self._records_offset:
+            with FileLock(self._lock_path, exclusive=False):
+                self._refresh()
+
+    def __len__(self):
+        return len(self._records)
+
+    def __contains__(self, candidate_id):
+        return candidate_id in self._latest
+
+    def _index(self, row, record):
+        previous = self._latest.get(record["candidate_id"])
+        if previous is not None:
+            self._superseded.add(previous)
+        self._latest[record["candidate_id"]] = row
+        if record.get("file_hash"):
+            self._files[record["file_hash"]] = row
+
+    def _is_stored(self, result):
+        row = self._latest.get(result["candidate_id"])
+        return row is not None and self._records[row].get("analysis_version") == result.get("analysis_version")
+
+    def add(self, results, embeddings):
+        """
+        Appends analysed results with their (L2-normalised) embeddings, skipping candidates already stored under
+        the same analysis_version. A candidate analysed under a new version supersedes its earlier row.
+        """
+        with self._lock, FileLock(self._lock_path):
+            self._refresh()
+            # Timings describe one run, not the candidate
+            rows, seen = [], set()
+            for result, embedding in zip(results, embeddings):
+                version_key = (result["candidate_id"], result.get("analysis_version"))
+                if version_key not in seen and not self._is_stored(result):
+                    seen.add(version_key)
+                    rows.append(({key: value for key, value in result.items() if key != "timings"}, embedding))
+            if not rows:
+                return 0
+
+            if self.dimension is None:
+                self.dimension = len(rows[0][1])
+                with open(self._meta_path, "w") as f:
+                    json.dump({"dimension": self.dimension, "model": self.model_name, "backend": self.backend}, f)
+            if any(len(embedding) != self.dimension for _, embedding in rows):
+                raise ValueError(f"Candidate store {self.directory} holds {self.dimension}-dimensional embeddings.")
+
+            # Truncate any partial tail left behind by a crash before appending; the file lock keeps other writers out
+            with open(self._embeddings_path, "ab") as f:
+                f.truncate(len(self._records) * 4 * self.dimension)
+                f.write(np.asarray([embedding for _, embedding in rows], dtype=np.float32).tobytes())
+            lines = "".join(json.dumps(result) + "\n" for result, _ in rows).encode("utf-8")
+            with open(self._records_path, "ab") as f:
+                f.truncate(self._records_offset)
+                f.write(lines)
+            self._records_offset += len(lines)
+
+            for result, _ in rows:
+                self._index(len(self._records), result)
+                self._records.append(result)
+            self._matrix = None
+            return len(rows)
+
+    def records(self, start=0):
+        """Stored records from row start onwards, in the order they were added."""
+        with self._lock:
+            self._sync()
+            return self._records[start:]
+
+    def _embeddings(self):
+        if self._matrix is None or self._matrix.shape[0] != len(self._records):
+            self._matrix = np.memmap(self._embeddings_path, dtype=np.float32, mode="r", shape=(len(self._records), self.dimension))
+        return self._matrix
+
+    def superseded(self):
+        """Rows replaced by a later analysis of the same candidate."""
+        with self._lock:
+            self._sync()
+            return sorted(self._superseded)
+
+    def find_file(self, file_hash, analysis_version):
+        """Returns (record, embedding) of a file analysed before under the same AnalysisVersion, or None."""
+        with self._lock:
+            self._sync()
+            row = self._files.get(file_hash)
+            if row is None or self._records[row].get("analysis_version") != analysis_version:
+                return None
+            return self._records[row], np.array(self._embeddings()[row])
+
+    def top_k(self, query_embedding, k=10):
+        """Returns the k best (record, similarity) pairs for an L2-normalised query embedding."""
+        with self._lock:
+            self._sync()
+            if not self._records:
+                return []
+            records = self._records
+            scores = self._embeddings() @ np.asarray(query_embedding, dtype=np.float32)
+            superseded = list(self._superseded)
+
+        scores[superseded] = -np.inf
+        k = min(k, len(scores) - len(superseded))
+        if k <= 0:
+            return []
+        top_indices = np.argpartition(-scores, k - 1)[:k]
+        top_indices = top_indices[np.argsort(-scores[top_indices])]
+        return [(records[index], float(scores[index])) for index in top_indices]
+
+_candidate_store = None
+_candidate_store_lock = threading.Lock()
+
+def GetCandidateStore():
+    """Returns the process-wide candidate store."""
+    global _candidate_store
+    with _candidate_store_lock:
+        if _candidate_store is None:
+            _candidate_store = CandidateStore()
+        return _candidate_store
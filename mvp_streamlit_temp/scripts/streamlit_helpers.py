@@ -2,18 +2,25 @@ import json
 import requests
 import streamlit as st
 from .helpers import VerifyInputRequirements
+from .session import GetSessionStorage, SessionId, SetSessionValue
 
 # SESSION STATE DELETION FUNCTIONS
 def clear_resume_analysis():
     st.session_state.resume_input_component_key += 1
     st.session_state.job_description_input_component_key += 1
-    st.session_state.applicants_datatable = None
-    st.session_state.applicants_dataframe = None
+    st.session_state.resumes_input = None
+    st.session_state.job_description_input = None
+    # Drops the session's results, generated documents and spilled uploads
+    GetSessionStorage().clear(SessionId())
     st.session_state.flagged_applicant = None
+    st.session_state.job_id = None
+    st.session_state.accepted_applicants = {}
+    st.session_state.dispatch_report = None
+    st.query_params.pop("job", None)
 
 def clear_applicant_contact():
     st.session_state.flagged_applicant = None
-    st.session_state.offer_letter = None
+    SetSessionValue("offer_letter", None)
 
 # SESSION STATE UPDATION FUNCTIONS
 def go_to_resume_analysis_page():
@@ -5,9 +5,16 @@ from datetime import datetime
 from streamlit_lottie import st_lottie
 
 import scripts.streamlit_helpers as st_helpers
-from scripts.analysis import AnalyseBatch
-from scripts.decision import GenerateOfferLetter, EmailOfferLetter
-from scripts.helpers import DatatableToDataframe, VerifyInputRequirements
+from scripts.analysis import AnalyseBatch, TrackBatch
+from scripts.decision import GenerateOfferLetter, EmailOfferLetter, GetTemplateIndex, OfferLettersZip, RenderOfferLetters, SendOfferLetters
+from scripts.embeddings import WarmUpModelsInBackground
+from scripts.helpers import DatatableToDataframe, SearchResultsToDataframe, StageTimingsToDataframe, GetResourceUsage, VerifyInputRequirements, MAX_RESUMES
+from scripts.metrics import StartMetricsServer
+from scripts.jobs import GetJobRunner
+from scripts.pipeline import RankStoredCandidates
+from scripts.search import GetSearchIndex, EDUCATION_LEVELS
+from scripts.session import SessionValue, SetSessionValue, SpillUploads, TouchSession
+from scripts.store import GetCandidateStore
 
 # SITE CONFIGURATION
 st.set_page_config(
@@ -16,6 +23,11 @@ st.set_page_config(
     layout="wide"
 )
 
+# Prometheus /metrics endpoint when METRICS_PORT is set (once per process)
+StartMetricsServer()
+# Keeps this session alive in the session storage and evicts idle ones
+TouchSession()
+
 # STATIC DIRECTORY REFERENCES
 if "offer_letter_templates_dir" not in st.session_state:
     #st.session_state.offer_letter_templates_dir = os.getenv("offer_letter_templates_directory")
@@ -31,14 +43,25 @@ if "resumes_input" not in st.session_state:
     st.session_state.resumes_input = None # Stores uploaded resume documents
 if "job_description_input" not in st.session_state:
     st.session_state.job_description_input = None # Stores uploaded job description document
-if "applicants_datatable" not in st.session_state:
-    st.session_state.applicants_datatable = None # Stores complete tool results for each applicant in table format
-if "applicants_dataframe" not in st.session_state:
-    st.session_state.applicants_dataframe = None # Stores reduced tool results for each applicant in dataframe format
+# Results (applicants_datatable, applicants_dataframe, historical_datatable) and generated offer letters
+# (offer_letter, offer_letters_zip) are kept with SetSessionValue, spilled to disk over the memory budget
+if "job_id" not in st.session_state:
+    # Reattach to the analysis job in the URL after a page refresh
+    st.session_state.job_id = st.query_params.get("job") # Stores the id of the background analysis job of this session
+    job = GetJobRunner().status(st.session_state.job_id) if st.session_state.job_id else None
+    if job is None:
+        st.session_state.job_id = None
+    else:
+        st.session_state.current_tab = "Results" if job["status"] == "completed" else "Processing"
+        applicants_datatable = GetJobRunner().results(st.session_state.job_id)
+        SetSessionValue("applicants_datatable", applicants_datatable)
+        SetSessionValue("applicants_dataframe", DatatableToDataframe(applicants_datatable) if applicants_datatable else None)
 if "flagged_applicant" not in st.session_state:
     st.session_state.flagged_applicant = None # Stores flagged applicant in session for other pages
-if "offer_letter" not in st.session_state:
-    st.session_state.offer_letter = None # Stores generated offer letter file in bytes format
+if "accepted_applicants" not in st.session_state:
+    st.session_state.accepted_applicants = {} # Stores every accepted applicant by candidate id, for bulk offers
+if "dispatch_report" not in st.session_state:
+    st.session_state.dispatch_report = None # Stores per-recipient status of the last bulk offer dispatch
 
 # EXPERIMENTAL KEY VALUE TO CLEAR FILE UPLOADS
 if "resume_input_component_key" not in st.session_state:
@@ -58,6 +81,8 @@ st.divider()
 
 # RESUME ANALYSIS PAGE CONTENT
 if st.session_state.current_tab == "Resume Analysis":
+    # Load the similarity model while the user uploads files (once per process, does not block rendering)
+    WarmUpModelsInBackground()
     app_info_col, blank_col_0, input_documents_col = st.columns([5,1,4])
     with app_info_col.empty():
         st.image("./frontend/homepage.png", width=1400)
@@ -71,48 +96,103 @@ if st.session_state.current_tab == "Resume Analysis":
                 st.button("📄 Results", use_container_width=True, on_click=st_helpers.go_to_results_page, key="go_to_results", type="secondary")
             with clear_col:
                 st.button("⛔ Clear", use_container_width=True, on_click=st_helpers.clear_resume_analysis, key="clear_resume_analysis", type="secondary")
-            st.session_state.resumes_input = st.file_uploader("Upload up to 10 resumes (.PDF or .TXT)", accept_multiple_files=True, type=['pdf', 'txt'], key=st.session_state.resume_input_component_key)
+            st.session_state.resumes_input = st.file_uploader(f"Upload up to {MAX_RESUMES} resumes (.PDF or .TXT)", accept_multiple_files=True, type=['pdf', 'txt'], key=st.session_state.resume_input_component_key)
             st.session_state.job_description_input = st.file_uploader("Upload job description (.TXT)", type='txt', key=st.session_state.job_description_input_component_key)
 
             if st.button("Submit", use_container_width=True, type="primary"):
                 if VerifyInputRequirements(st.session_state.resumes_input, st.session_state.job_description_input):
+                    # Uploads are moved to disk; session state keeps only their handles
+                    st.session_state.resumes_input = SpillUploads(st.session_state.resumes_input)
+                    st.session_state.job_description_input = SpillUploads([st.session_state.job_description_input])[0]
+                    # New uploader widgets, so Streamlit releases the uploaded bytes it still holds
+                    st.session_state.resume_input_component_key += 1
+                    st.session_state.job_description_input_component_key += 1
+                    st.session_state.job_id = None
                     st_helpers.go_to_processing_page()
                     st.rerun()
                     
 
 # PROCESSING PAGE CONTENT
 elif st.session_state.current_tab == "Processing":
-    st.session_state.applicants_datatable = AnalyseBatch(st.session_state.resumes_input, st.session_state.job_description_input, "Gemini")
-    if st.session_state.applicants_datatable:
-        st.session_state.applicants_dataframe = DatatableToDataframe(st.session_state.applicants_datatable)
-        st_helpers.go_to_results_page()
-        st.rerun()
+    # Analysis runs as a background job; reruns and refreshes only reattach to it
+    if st.session_state.job_id is None:
+        SetSessionValue("applicants_datatable", None)
+        SetSessionValue("applicants_dataframe", None)
+        SetSessionValue("historical_datatable", None)
+        st.session_state.job_id = AnalyseBatch(st.session_state.resumes_input, st.session_state.job_description_input, "Gemini")
+        st.query_params["job"] = st.session_state.job_id
+        # The job keeps its own copy of the inputs; spilled handles would go stale once an idle session is evicted
+        for spilled_file in st.session_state.resumes_input + [st.session_state.job_description_input]:
+            spilled_file.discard()
+        st.session_state.resumes_input = None
+        st.session_state.job_description_input = None
+    TrackBatch(st.session_state.job_id)
     
 
 # RESULTS PAGE CONTENT
 elif st.session_state.current_tab == "Results":
     table_col, blank_col_3, detailed_col = st.columns([4,1,5])
+    applicants_datatable = SessionValue("applicants_datatable")
+    applicants_dataframe = SessionValue("applicants_dataframe")
+    if applicants_datatable is None and st.session_state.job_id:
+        # Evicted while idle: the job's checkpointed results are still available
+        applicants_datatable = GetJobRunner().results(st.session_state.job_id) or None
+        applicants_dataframe = DatatableToDataframe(applicants_datatable) if applicants_datatable else None
+        SetSessionValue("applicants_datatable", applicants_datatable)
+        SetSessionValue("applicants_dataframe", applicants_dataframe)
     with table_col:
         # CONTAINER: output_score_table
         with st.container(border=False, key="output_score_table", height=650):
-            st.markdown("##### Comparison table")
-            if st.session_state.applicants_dataframe is not None: 
-                st.dataframe(data=st.session_state.applicants_dataframe, use_container_width=True)
+            heading_col, history_col = st.columns([3,2], vertical_alignment="center")
+            with heading_col:
+                st.markdown("##### Comparison table")
+            with history_col:
+                # Rank every stored candidate against the current job description, not only this upload
+                include_history = st.toggle("All candidates", key="include_history", disabled=st.session_state.job_id is None)
+            job_description_text = GetJobRunner().job_description(st.session_state.job_id) if include_history and st.session_state.job_id else None
+            if job_description_text is not None:
+                historical_datatable = SessionValue("historical_datatable")
+                if historical_datatable is None:
+                    with st.spinner("Ranking previous candidates..."):
+                        historical_datatable = RankStoredCandidates(job_description_text, "Gemini", GetCandidateStore())
+                    SetSessionValue("historical_datatable", historical_datatable)
+                applicants_datatable = historical_datatable
+                applicants_dataframe = DatatableToDataframe(applicants_datatable) if applicants_datatable else None
+            if applicants_dataframe is not None: 
+                st.dataframe(data=applicants_dataframe, use_container_width=True)
+                if applicants_datatable and not include_history:
+                    with st.expander("⏱️ Processing breakdown"):
+                        st.dataframe(data=StageTimingsToDataframe(applicants_datatable), use_container_width=True)
+                        st.caption(f"Memory: {GetResourceUsage()['memory_consumed']:.0f} MB")
             else: 
-                st.info("Upload upto 10 resumes, a job description and click submit to view comparison table")
+                st.info(f"Upload upto {MAX_RESUMES} resumes, a job description and click submit to view comparison table")
+            # Keyword search over every analysed candidate, not only this batch
+            with st.expander("🔎 Search all candidates"):
+                query_input = st.text_input("Keywords", placeholder="e.g. kubernetes python", key="search_query")
+                experience_col, education_col = st.columns(2)
+                min_experience_input = experience_col.number_input("Minimum years of experience", min_value=0, step=1, key="search_min_experience")
+                min_education_input = education_col.selectbox("Minimum education", EDUCATION_LEVELS, key="search_min_education")
+                if query_input or min_experience_input or min_education_input != "Any":
+                    search_results = GetSearchIndex().search(query_input, min_experience=min_experience_input, min_education=EDUCATION_LEVELS.index(min_education_input))
+                    if search_results:
+                        st.dataframe(data=SearchResultsToDataframe(search_results), use_container_width=True, hide_index=True)
+                    else:
+                        st.caption("No matching candidates.")
     
     with detailed_col:
         # CONTAINER: detailed_analysis
         with st.container(border=False, key="detailed_analysis", height=550):
             st.markdown("##### Detailed Analysis")
-            if st.session_state.applicants_datatable:
+            if applicants_datatable:
                 dropdown_col, flag_col = st.columns([4,1], vertical_alignment="bottom")
                 with dropdown_col:
-                    applicant_index = st.selectbox("Select an applicant for more information", [applicant_row["name"] for applicant_row in st.session_state.applicants_datatable])
-                selected_applicant_row = next(applicant_row for applicant_row in st.session_state.applicants_datatable if applicant_row["name"] == applicant_index)
+                    applicant_index = st.selectbox("Select an applicant for more information", [applicant_row["name"] for applicant_row in applicants_datatable])
+                selected_applicant_row = next(applicant_row for applicant_row in applicants_datatable if applicant_row["name"] == applicant_index)
                 with flag_col:
-                    if st.button("Accept", use_container_width=True, type="primary"):
+                    # Resumes that failed analysis have no candidate id and nothing to make an offer on
+                    if st.button("Accept", use_container_width=True, type="primary", disabled=selected_applicant_row["status"] != "Success"):
                         st.session_state.flagged_applicant = selected_applicant_row
+                        st.session_state.accepted_applicants[selected_applicant_row["candidate_id"]] = selected_applicant_row
 
                 st.text(f"Message: {selected_applicant_row['status']}")
                 st.text(f"Similarity score: {selected_applicant_row['similarity_score']}")
@@ -122,7 +202,7 @@ elif st.session_state.current_tab == "Results":
                 st.text(f"Strengths: {selected_applicant_row['strengths']}")
                 st.text(f"Decision: {selected_applicant_row['tool_response']}")
             else:
-                st.info("Upload upto 10 resumes, a job description and click submit to view detailed analysis")
+                st.info(f"Upload upto {MAX_RESUMES} resumes, a job description and click submit to view detailed analysis")
         
         blank_col_4, next_col = st.columns([4,1])
         with next_col:
@@ -203,18 +283,12 @@ elif st.session_state.current_tab == "Offer Letter Generation":
                         st.markdown("##### Offer letter")
                         # Job role selection
                         try:
-                            filenames = os.listdir(st.session_state.offer_letter_templates_dir)
-                            offer_letter_templates = [file for file in filenames if os.path.isfile(os.path.join(st.session_state.offer_letter_templates_dir, file)) and file.endswith(".docx")]
+                            # Listed again only when the directory changes
+                            template_job_pairs = GetTemplateIndex(st.session_state.offer_letter_templates_dir).templates()
                         except FileNotFoundError:
-                            offer_letter_templates = []
+                            template_job_pairs = []
                             st.error(f"Specified directory: {st.session_state.offer_letter_templates_dir} not found. Please update the path")
-                        
-                        template_job_pairs = [
-                            (file, file.split('-')[-1].replace('.docx', '').replace('_', ' ')) 
-                            for file in offer_letter_templates
-                        ]
-                        template_job_pairs.sort(key=lambda x: x[1])
-                        offer_letter_templates, job_roles = zip(*template_job_pairs) if template_job_pairs else (None, None)
+                        job_roles, offer_letter_templates = zip(*template_job_pairs) if template_job_pairs else (None, None)
 
                         if offer_letter_templates:
                             job_role_input = st.selectbox("Job Role", job_roles)
@@ -226,17 +300,18 @@ elif st.session_state.current_tab == "Offer Letter Generation":
                         generate_col, email_col = st.columns([3,2])
                         if generate_col.button("Generate", use_container_width=True, type="primary"):
                             if name_input and start_date_input and hours_per_week_input and offer_letter_template:
-                                st.session_state.offer_letter = GenerateOfferLetter(
+                                offer_letter = GenerateOfferLetter(
                                     os.path.join(st.session_state.offer_letter_templates_dir, offer_letter_template),
                                     name_input,
                                     start_date_input,
                                     job_role_input,
                                     hours_per_week_input
                                 )
-                                if st.session_state.offer_letter:
+                                SetSessionValue("offer_letter", offer_letter)
+                                if offer_letter:
                                     st.download_button(
                                         label="Download .DOCX",
-                                        data=st.session_state.offer_letter,
+                                        data=offer_letter,
                                         file_name=f"{name_input} CDF Offer Letter - {job_role_input}.docx",
                                         mime="application/vnd.openxmlformats-officedocument.wordprocessingml.document",
                                     )
@@ -244,11 +319,52 @@ elif st.session_state.current_tab == "Offer Letter Generation":
                                 st.warning("Required inputs missing. Offer letter might consist errors.")
 
                         if email_col.button("Email", icon="📧", use_container_width=True, type="secondary"):
-                            if st.session_state.offer_letter:
-                                if EmailOfferLetter(st.session_state.offer_letter, st.session_state.volunteer_waiver, name_input, email_input, job_role_input):
-                                    st.session_state.offer_letter=None
+                            offer_letter = SessionValue("offer_letter")
+                            if offer_letter:
+                                if EmailOfferLetter(offer_letter, st.session_state.volunteer_waiver, name_input, email_input, job_role_input):
+                                    SetSessionValue("offer_letter", None)
                             else:
                                 st.error("Offer letter not found. Please generate and validate manually it first")
+
+                        # Every applicant accepted on the Results page, with the role, start date and hours above
+                        accepted_applicants = list(st.session_state.accepted_applicants.values())
+                        with st.expander(f"Send offers to all accepted applicants ({len(accepted_applicants)})"):
+                            bulk_arguments = (
+                                os.path.join(st.session_state.offer_letter_templates_dir, offer_letter_template) if offer_letter_template else None,
+                                [applicant["name"] for applicant in accepted_applicants],
+                                start_date_input,
+                                job_role_input if offer_letter_template else None,
+                                hours_per_week_input,
+                            )
+                            zip_col, send_col = st.columns(2)
+                            if zip_col.button("Generate all", icon="🗂️", use_container_width=True, type="secondary", disabled=not (accepted_applicants and offer_letter_template)):
+                                with st.spinner(f"Generating {len(accepted_applicants)} offer letters..."):
+                                    try:
+                                        SetSessionValue("offer_letters_zip", OfferLettersZip(*bulk_arguments))
+                                    except Exception as e:
+                                        st.error(f"Error occured during offer letter generation: {str(e)}")
+                            if send_col.button("Send all", icon="📧", use_container_width=True, type="secondary", disabled=not (accepted_applicants and offer_letter_template)):
+                                with st.spinner(f"Sending {len(accepted_applicants)} offer letters..."):
+                                    try:
+                                        offer_letters = dict(RenderOfferLetters(*bulk_arguments))
+                                        offers = [
+                                            {"name": applicant["name"], "email": applicant["email"], "status": applicant["status"], "job_role": job_role_input, "offer_letter": offer_letters[index]}
+                                            for index, applicant in enumerate(accepted_applicants)
+                                        ]
+                                        st.session_state.dispatch_report = SendOfferLetters(offers, st.session_state.volunteer_waiver)
+                                    except Exception as e:
+                                        st.error(f"Error occured when sending offer letters: {str(e)}")
+                            offer_letters_zip = SessionValue("offer_letters_zip")
+                            if offer_letters_zip:
+                                st.download_button(
+                                    label="Download .ZIP",
+                                    data=offer_letters_zip,
+                                    file_name="CDF Offer Letters.zip",
+                                    mime="application/zip",
+                                    use_container_width=True,
+                                )
+                            if st.session_state.dispatch_report:
+                                st.dataframe(data=st.session_state.dispatch_report, use_container_width=True, hide_index=True)
                 
 
 
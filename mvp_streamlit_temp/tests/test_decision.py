@@ -0,0 +1,85 @@
+import os
+import smtplib
+import socket
+import sys
+from email import message_from_bytes
+
+import pytest
+
+aiosmtpd = pytest.importorskip("aiosmtpd.controller")
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from scripts.decision import SendOfferLetters, SmtpConnectionPool
+
+class RecordingHandler:
+    def __init__(self):
+        self.messages = []
+
+    async def handle_DATA(self, server, session, envelope):
+        self.messages.append(message_from_bytes(envelope.content))
+        return "250 OK"
+
+def FreePort():
+    with socket.socket() as probe:
+        probe.bind(("127.0.0.1", 0))
+        return probe.getsockname()[1]
+
+@pytest.fixture
+def smtp_server():
+    handler = RecordingHandler()
+    # aiosmtpd's controller cannot bind port 0 itself
+    controller = aiosmtpd.Controller(handler, hostname="127.0.0.1", port=FreePort())
+    controller.start()
+    try:
+        yield controller, handler
+    finally:
+        controller.stop()
+
+@pytest.fixture
+def volunteer_waiver(tmp_path):
+    path = tmp_path / "waiver.docx"
+    path.write_bytes(b"waiver")
+    return str(path)
+
+def Pool(controller, credentials=("hr@example.org", "")):
+    return SmtpConnectionPool(controller.hostname, controller.port, credentials=credentials, starttls=False)
+
+def Offer(name, email, status="Success"):
+    return {"name": name, "email": email, "status": status, "job_role": "Data Analyst", "offer_letter": b"offer"}
+
+def test_bulk_send_delivers_valid_offers_and_reports_the_rest(smtp_server, volunteer_waiver):
+    controller, handler = smtp_server
+    offers = [Offer(f"Applicant {index}", f"applicant{index}@example.org") for index in range(6)]
+    offers += [Offer("No Email", "Email Not Found"), Offer("Failed", "failed@example.org", status="Failed: unreadable PDF")]
+
+    report = SendOfferLetters(offers, volunteer_waiver, Pool(controller), workers=3)
+
+    assert [row["name"] for row in report] == [offer["name"] for offer in offers]
+    assert [row["status"] for row in report[:6]] == ["Sent"] * 6
+    assert report[6]["status"].startswith("Not sent")
+    assert report[7]["status"].startswith("Not sent")
+    assert sorted(message["To"] for message in handler.messages) == sorted(offer["email"] for offer in offers[:6])
+    attachments = [part.get_filename() for part in handler.messages[0].get_payload()[1:]]
+    assert attachments[1] == "CDF Volunteer Waiver.docx"
+
+def test_pool_reconnects_after_server_drops_connection(smtp_server, volunteer_waiver, monkeypatch):
+    controller, handler = smtp_server
+    pool = Pool(controller)
+    discarded = []
+    discard = SmtpConnectionPool._discard
+    monkeypatch.setattr(SmtpConnectionPool, "_discard", staticmethod(lambda connection: discarded.append(connection) or discard(connection)))
+
+    # A pooled connection the server has since dropped
+    stale = pool._connect()
+    stale.sock.close()
+    pool._idle.put(stale)
+    assert SendOfferLetters([Offer("Applicant", "applicant@example.org")], volunteer_waiver, pool)[0]["status"] == "Sent"
+
+    assert len(handler.messages) == 1
+    assert discarded[0] is stale
+
+def test_pool_skips_login_without_credentials(smtp_server, monkeypatch):
+    controller, _ = smtp_server
+    monkeypatch.setattr(smtplib.SMTP, "login", lambda *args: pytest.fail("login attempted without credentials"))
+    for credentials in (None, ("", ""), ("hr@example.org", "")):
+        Pool(controller, credentials)._connect().quit()